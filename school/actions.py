@@ -0,0 +1,376 @@
+"""A module for parsing the arguments of the school script and running its actions."""
+import argparse
+from functools import partial
+
+from lookup import Trie
+from utilities import *
+
+# the actions that have to run in the script itself (since they open other programs,
+# ask questions, etc.), as opposed to running in the daemon
+INTERACTIVE_ACTIONS = {
+    ("open",),
+    ("initialize",),
+    ("serve",),
+    ("homework", "add"),
+    ("homework", "edit"),
+    ("homework", "extrapolate"),
+
+    # not interactive, but it writes to files relative to the working directory
+    ("export",),
+
+    # reads the commands from the standard input (or a file relative to the working
+    # directory)
+    ("batch",),
+}
+
+# the actions that can't be run from a batch (the ones that need the terminal)
+NON_BATCH_ACTIONS = INTERACTIVE_ACTIONS - {("export",), ("initialize",)}
+
+# the actions that win when their prefix is ambiguous (the prefixes that were unique
+# before the actions sharing them were added, like 'i' before 'index')
+PREFERRED_ACTIONS = {
+    ("initialize",),
+    ("homework", "extrapolate"),
+}
+
+# the actions whose arguments are courses/homework UIDs (for completing them)
+COURSE_ARGUMENT_ACTIONS = {
+    ("open",),
+    ("homework", "list"),
+    ("homework", "add"),
+    ("homework", "extrapolate"),
+}
+UID_ARGUMENT_ACTIONS = {
+    ("homework", "edit"),
+    ("homework", "remove"),
+    ("homework", "complete"),
+    ("homework", "incomplete"),
+}
+
+
+def positive_int(value: str) -> int:
+    """The type of the options that are a positive number."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a positive number")
+
+    return number
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return the parser of the arguments of the script."""
+    parser = argparse.ArgumentParser(
+        description="A script for simplifying my university education.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+
+    parser.add_argument(
+        "actions",
+        nargs="+",
+    )
+
+    parser.add_argument("-s", "--short", action="store_true", help="shorten the output")
+    parser.add_argument(
+        "-f",
+        "--folder",
+        help="set the courses folder (overrides config file), or a glob pattern of them",
+    )
+    parser.add_argument(
+        "--next",
+        dest="limit",
+        type=positive_int,
+        metavar="N",
+        help="only list the first N homeworks (the ones with the nearest deadlines)",
+    )
+    parser.add_argument(
+        "--until",
+        metavar="DATE",
+        help="only list the homeworks due before the date (YYYY-MM-DD[ HH:MM],"
+        " the whole day if the time is left out)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["table", "json", "ndjson"],
+        default="table",
+        help="the format of the listings (JSON records instead of a table)",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="report the time it took to import each of the modules",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="report the time spent in the phases of the action (walking the folder,\n"
+        "parsing, ...) and the number of files parsed, cache hits, etc. to stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="profile the action, saving the statistics to the file (see pstats)",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="update the existing courses when initializing (only changed files are written)",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="list the courses folder concurrently and parse the changed files in a"
+        " process pool (faster on network file systems)",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="don't forward the command to the daemon, even if it is running",
+    )
+    parser.add_argument(
+        "--complete",
+        action="store_true",
+        help="print the completions of the last of the actions (for shell completion)",
+    )
+
+    return parser
+
+
+class ActionTrie:
+    """The action tree, compiled so that each of its levels is a prefix tree of the
+    names of its actions (the leaves being the functions to call)."""
+
+    def __init__(self, tree: Dict):
+        self.names = Trie()
+        self.children: Dict[Tuple, Union[ActionTrie, Callable]] = {}
+
+        for names, subtree in tree.items():
+            if isinstance(subtree, dict):
+                subtree = ActionTrie(subtree)
+
+            self.children[names] = subtree
+
+            for name in names:
+                self.names.insert(name, names)
+
+    def find(self, prefix: str) -> List[Tuple]:
+        """Return the actions (the tuples of their names) with a name that starts with
+        the prefix."""
+        return list(dict.fromkeys(self.names.find(prefix)))
+
+    def __str__(self):
+        return f"{{{', '.join(' or '.join(d) for d in self.children)}}}"
+
+
+def get_action_tree(courses, homeworks, cwd: str) -> ActionTrie:
+    """Return the compiled tree of the actions."""
+    from daemon import serve
+    from export import export_ics
+
+    return ActionTrie({
+        ("list",): {
+            ("courses",): courses.list,
+            ("finals",): courses.finals,
+            ("timeline",): courses.timeline,
+        },
+        ("open",): {
+            ("course",): partial(courses.open, "folder"),
+            ("website",): partial(courses.open, "website"),
+            ("lsf",): partial(courses.open, "lsf"),
+            ("notes",): partial(courses.open, "notes"),
+            ("online",): partial(courses.open, "online"),
+        },
+        ("initialize",): partial(courses.initialize, cwd),
+        ("index",): {
+            ("rebuild",): courses.rebuild_index,
+            ("stats",): courses.index_stats,
+        },
+        ("homework",): {
+            ("list",): homeworks.list,
+            ("add", "new"): homeworks.add,
+            ("edit",): homeworks.edit,
+            ("remove", "delete"): homeworks.delete,
+            ("complete", "finish"): homeworks.complete,
+            ("incomplete", "unfinish"): homeworks.incomplete,
+            ("extrapolate",): homeworks.extrapolate,
+            ("import",): homeworks.import_files,
+            ("export",): homeworks.export_files,
+        },
+        ("export",): {
+            ("ics",): partial(export_ics, courses, homeworks, cwd),
+        },
+        ("serve",): partial(serve, courses, homeworks),
+        ("batch",): partial(batch, courses, homeworks, cwd),
+    })
+
+
+def resolve(
+    action_tree: ActionTrie, actions: List[str]
+) -> Tuple[Callable, Tuple, List[str]]:
+    """Go down the action tree, returning the function of the action, its path (the
+    first names of the actions) and the remaining (unused) arguments."""
+    actions = list(actions)
+    path = ()
+
+    while len(actions) != 0 and isinstance(action_tree, ActionTrie):
+        action = actions.pop(0)
+
+        candidates = action_tree.find(action) if len(action) != 0 else []
+
+        # an action with the exact name (or, failing that, a preferred one) wins
+        if len(candidates) > 1:
+            preferred = [c for c in candidates if action in c] or [
+                c for c in candidates if path + (c[0],) in PREFERRED_ACTIONS
+            ]
+
+            if len(preferred) == 1:
+                candidates = preferred
+
+        # if no match is found, quit with error
+        if len(candidates) == 0:
+            sys.exit(
+                f"ERROR: '{action}' doesn't match actions in the action tree:"
+                f" {action_tree}"
+            )
+
+        # if there are multiple matches, the command is ambiguous
+        if len(candidates) > 1:
+            sys.exit(
+                f"ERROR: Ambiguous actions for '{action}':"
+                f" {{{', '.join(' or '.join(d) for d in sorted(candidates))}}}",
+            )
+        else:
+            action_tree = action_tree.children[candidates[0]]
+            path += (candidates[0][0],)
+
+    # if the action tree isn't a function by now, exit; else extract the function
+    if isinstance(action_tree, ActionTrie):
+        exit_with_error(f"Actions remaining: {action_tree}")
+
+    return action_tree, path, actions
+
+
+def complete(action_tree: ActionTrie, words: List[str], courses, homeworks) -> List[str]:
+    """Return the completions of the last of the words (the previous ones being the
+    actions and arguments before it), using only what is already in the index."""
+    *words, prefix = words
+    path = ()
+
+    while len(words) != 0 and isinstance(action_tree, ActionTrie):
+        candidates = action_tree.find(words.pop(0))
+
+        # there is nothing to complete after an invalid/ambiguous action
+        if len(candidates) != 1:
+            return []
+
+        action_tree = action_tree.children[candidates[0]]
+        path += (candidates[0][0],)
+
+    if isinstance(action_tree, ActionTrie):
+        return [
+            name
+            for names in action_tree.find(prefix)
+            for name in names
+            if name.startswith(prefix)
+        ]
+
+    prefixes = {path[:i] for i in range(1, len(path) + 1)}
+
+    if prefixes & COURSE_ARGUMENT_ACTIONS:
+        candidates = courses.get_indexed_abbreviations()
+    elif prefixes & UID_ARGUMENT_ACTIONS:
+        candidates = homeworks.get_indexed_uids()
+    else:
+        return []
+
+    prefix = prefix.lower()
+    return [c for c in candidates if c.startswith(prefix) and c not in words]
+
+
+def is_interactive(path: Tuple, actions: Set[Tuple] = INTERACTIVE_ACTIONS) -> bool:
+    """Return True if the action with the given path has to run in the script itself
+    (i.e. it or one of its parents is in actions)."""
+    return any(path[:i] in actions for i in range(1, len(path) + 1))
+
+
+def get_exit_code(e: SystemExit) -> int:
+    """Return the exit code of the SystemExit, printing its message if it has one."""
+    if e.code is None or isinstance(e.code, int):
+        return e.code or 0
+
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def batch(courses, homeworks, cwd: str, path: str = None, **kwargs):
+    """Run the commands (one per line) from the file (or the standard input) on the
+    same courses, printing a '>>> <command>' line before the output of each of them.
+    A failing command doesn't stop the others, but the batch then exits with 1."""
+    import shlex
+
+    action_tree = get_action_tree(courses, homeworks, cwd)
+
+    if path is None:
+        lines = sys.stdin
+    else:
+        try:
+            lines = open(os.path.join(cwd, path))
+        except OSError as e:
+            exit_with_error(f"Can't read the batch file ({e.strerror}).")
+
+    failed = 0
+
+    with lines:
+        for line in lines:
+            line = line.strip()
+
+            # skip empty lines and comments
+            if len(line) == 0 or line[0] == "#":
+                continue
+
+            print(f">>> {line}", flush=True)
+
+            try:
+                words = shlex.split(line)
+            except ValueError as e:
+                # an unterminated quote in the line
+                print(f"{line}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+
+            try:
+                arguments = get_parser().parse_intermixed_args(words)
+                function, action_path, actions = resolve(action_tree, arguments.actions)
+
+                if is_interactive(action_path, NON_BATCH_ACTIONS):
+                    exit_with_error(f"'{' '.join(action_path)}' can't be run in a batch.")
+
+                # the previous commands might have changed some of the files
+                courses.refresh()
+
+                run(function, actions, arguments)
+            except SystemExit as e:
+                if get_exit_code(e) != 0:
+                    failed += 1
+            except Exception:
+                # a bug in one of the commands shouldn't stop the others
+                import traceback
+
+                traceback.print_exc()
+                failed += 1
+
+            sys.stdout.flush()
+
+    if failed != 0:
+        sys.exit(1)
+
+
+def run(function: Callable, arguments: List[str], options: argparse.Namespace):
+    """Run the function of an action with the given arguments and options."""
+    try:
+        function(*arguments, **vars(options))
+    except TypeError as e:
+        exit_with_error("Invalid arguments for the specified action.")
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+"""Benchmarks of the school script, run on synthetic courses folders."""
+import argparse
+import itertools
+import random
+import tempfile
+import time
+from string import ascii_lowercase
+
+import yaml
+
+from homework import HW_FOLDER, RESERVED_UIDS
+from utilities import *
+
+
+def get_nth_uid(n: int) -> str:
+    """Return the n-th homework UID (two letters, or more if they run out)."""
+    uid = ""
+    while len(uid) < 2 or n != 0:
+        uid += ascii_lowercase[n % 26]
+        n //= 26
+
+    return uid
+
+
+def generate_tree(
+    folder: str,
+    courses: int = 20,
+    homeworks: int = 0,
+    types: int = None,
+    slots: int = 7,
+    seed: int = 0,
+):
+    """Generate a synthetic courses folder with the given number of courses (each with
+    the first few course types that are in the configuration, scheduled in one of the
+    given number of time slots of a day) and homeworks (spread evenly between the
+    course types that can have homework)."""
+    rng = random.Random(seed)
+
+    homework_dirs = []
+    for i in range(courses):
+        for course_type in list(course_types)[:types]:
+            path = os.path.join(folder, f"Course {i} (C{i})", course_type)
+            os.makedirs(path, exist_ok=True)
+
+            start = 7 * 60 + 20 + rng.randrange(slots) * 100
+
+            with open(os.path.join(path, course_yaml), "w") as f:
+                f.write(
+                    f"code: NXXX{i:03d}\n"
+                    f"teacher:\n"
+                    f"    name: Teacher {rng.randrange(courses)}\n"
+                    f"time:\n"
+                    f"    day: {rng.choice(WD_EN[:5]).capitalize()}\n"
+                    f"    start: {start}\n"
+                    f"    end: {start + 90}\n"
+                    + ("    weeks: odd\n" if rng.random() < 0.2 else "")
+                    + f"classroom:\n"
+                    f"    number: S{rng.randrange(1, 12)}\n"
+                )
+
+            if course_types[course_type].has_homework:
+                homework_dirs.append(os.path.join(path, HW_FOLDER))
+
+    uids = (get_nth_uid(i) for i in itertools.count())
+    uids = (uid for uid in uids if uid not in RESERVED_UIDS)
+
+    for uid in itertools.islice(uids, homeworks):
+        path = homework_dirs[rng.randrange(len(homework_dirs))]
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, f"{uid}.yaml"), "w") as f:
+            f.write(
+                f"uid: {uid}\n"
+                f"name: Homework {rng.randrange(100)}\n"
+                f"description: \n"
+                f"deadline: 2020-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+                f" {rng.randrange(24):02d}:00:00\n"
+                f"\n"
+                f"completed: {rng.random() < 0.5}\n"
+            )
+
+
+def measure(function: Callable, repeat: int = 3) -> float:
+    """Return the best time (in seconds) out of the repeated calls of the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_yaml(arguments):
+    """Compare the pure-Python and the libyaml loaders on the homework files."""
+    with tempfile.TemporaryDirectory() as folder:
+        generate_tree(folder, arguments.courses, arguments.homeworks)
+
+        paths = [
+            os.path.join(root, f)
+            for root, _, filenames in os.walk(folder)
+            for f in filenames
+            if os.path.basename(root) == HW_FOLDER
+        ]
+
+        loaders = {"pure-Python": yaml.SafeLoader}
+        if hasattr(yaml, "CSafeLoader"):
+            loaders["libyaml"] = yaml.CSafeLoader
+
+        print(f"Parsing {len(paths)} homework files:")
+        for name, loader in loaders.items():
+            seconds = measure(lambda: load_yaml_files(paths, loader), arguments.repeat)
+            print(f"{name.rjust(12)}: {seconds:.3f} s ({seconds / len(paths) * 1e6:.0f} μs/file)")
+
+
+# the commands that are measured by the 'actions' benchmark (the interactive ones and
+# the destructive ones are left out)
+BENCHMARKED_COMMANDS = [
+    "list courses",
+    "list courses plain",
+    "list courses mo",
+    "list finals",
+    "list timeline",
+    "index stats",
+    "homework list",
+    "homework list all",
+    "homework list c1",
+    "homework complete aa",
+    "homework incomplete aa",
+]
+
+
+def run_command(folder: str, command: str) -> int:
+    """Run the command of the script in-process (on freshly created courses, so that
+    nothing is shared between the runs), discarding its output and returning its exit
+    code."""
+    from contextlib import redirect_stdout
+
+    from actions import get_action_tree, get_parser, resolve, run
+    from course import Courses
+    from homework import Homeworks
+
+    arguments = get_parser().parse_intermixed_args(["-f", folder] + command.split())
+
+    courses = Courses(folder)
+    homeworks = Homeworks(courses)
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        try:
+            tree = get_action_tree(courses, homeworks, os.getcwd())
+            function, _, actions = resolve(tree, arguments.actions)
+            run(function, actions, arguments)
+        except SystemExit as e:
+            return 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+
+    return 0
+
+
+def benchmark_actions(arguments):
+    """Measure the commands of the script on folders with different numbers of
+    homeworks, saving the results as JSON (to be compared across commits)."""
+    import json
+    import platform
+    import subprocess
+
+    results = []
+    table = [["Actions"]]
+
+    for homeworks in arguments.homeworks:
+        table.append([f"{arguments.courses} courses, {homeworks} homeworks"])
+
+        with tempfile.TemporaryDirectory() as folder:
+            generate_tree(
+                folder, arguments.courses, homeworks, arguments.types, arguments.slots
+            )
+
+            for command in BENCHMARKED_COMMANDS:
+                # the first run builds the index
+                code = run_command(folder, command)
+                seconds = measure(lambda: run_command(folder, command), arguments.repeat)
+
+                results.append(
+                    {
+                        "courses": arguments.courses,
+                        "homeworks": homeworks,
+                        "command": command,
+                        "seconds": seconds,
+                        "code": code,
+                    }
+                )
+                table.append([command, f"{seconds * 1000:.1f} ms", f"exit code {code}"])
+
+    print_table(table)
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.realpath(__file__)),
+    ).stdout.strip()
+
+    with open(arguments.output, "w") as f:
+        json.dump(
+            {"commit": commit, "python": platform.python_version(), "results": results},
+            f,
+            indent=4,
+        )
+
+
+def benchmark_compare(arguments):
+    """Compare the results of two runs of the 'actions' benchmark."""
+    import json
+
+    def load(path: str) -> Dict[Tuple, float]:
+        with open(path) as f:
+            data = json.load(f)
+
+        return {
+            (r["courses"], r["homeworks"], r["command"]): r["seconds"]
+            for r in data["results"]
+        }
+
+    old, new = load(arguments.old), load(arguments.new)
+
+    table = [["Comparison"]]
+    for key in old:
+        if key in new:
+            table.append(
+                [
+                    f"{key[2]} ({key[1]} homeworks)",
+                    f"{old[key] * 1000:.1f} ms",
+                    f"{new[key] * 1000:.1f} ms",
+                    Ansi.color(f"{new[key] / old[key]:.2f}x", 9 if new[key] > old[key] else 10),
+                ]
+            )
+
+    print_table(table)
+
+
+def benchmark_startup(arguments):
+    """Measure the cold start of 'school list courses' (a new process, with the index
+    already built and its courses checked, so neither YAML nor the type checks are
+    imported), failing if it takes longer than the budget."""
+    import subprocess
+
+    script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "school")
+
+    with tempfile.TemporaryDirectory() as folder:
+        generate_tree(folder, arguments.courses)
+
+        command = [sys.executable, script, "-f", folder, "list", "courses"]
+        run = lambda: subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+
+        # the first run builds the index
+        run()
+        seconds = measure(run, arguments.repeat)
+
+    print(f"'list courses' took {seconds * 1000:.0f} ms (budget {arguments.budget} ms).")
+
+    if seconds * 1000 > arguments.budget:
+        exit_with_error("Startup budget exceeded.")
+
+
+def benchmark_memory(arguments):
+    """Measure the memory taken by the loaded courses and homeworks (the bytes retained
+    per object, including their nested objects and strings)."""
+    import gc
+    import tracemalloc
+
+    from course import Courses
+    from homework import Homeworks
+
+    def retained(function: Callable) -> Tuple[int, Any]:
+        """Return the memory retained by the result of the function (and the result)."""
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        gc.collect()
+
+        return tracemalloc.get_traced_memory()[0] - before, result
+
+    with tempfile.TemporaryDirectory() as folder:
+        generate_tree(folder, arguments.courses, arguments.homeworks)
+
+        # the index is built (and loaded) before measuring, so only the objects count
+        courses = Courses(folder)
+        homeworks = Homeworks(courses)
+        courses.snapshot
+
+        tracemalloc.start()
+
+        course_bytes, course_objects = retained(courses.get_courses)
+        homework_bytes, homework_objects = retained(
+            lambda: homeworks.get_homeworks(completed=True)
+        )
+
+        tracemalloc.stop()
+
+    print_table(
+        [
+            ["Memory"],
+            [
+                f"{len(course_objects)} courses",
+                f"{course_bytes / 1024:.0f} KiB",
+                f"{course_bytes / len(course_objects):.0f} B/course",
+            ],
+            [
+                f"{len(homework_objects)} homeworks",
+                f"{homework_bytes / 1024:.0f} KiB",
+                f"{homework_bytes / len(homework_objects):.0f} B/homework",
+            ],
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    yaml_parser = subparsers.add_parser("yaml", help=benchmark_yaml.__doc__)
+    yaml_parser.add_argument("--courses", type=int, default=20)
+    yaml_parser.add_argument("--homeworks", type=int, default=5000)
+    yaml_parser.add_argument("--repeat", type=int, default=3)
+    yaml_parser.set_defaults(function=benchmark_yaml)
+
+    actions_parser = subparsers.add_parser("actions", help=benchmark_actions.__doc__)
+    actions_parser.add_argument("--courses", type=int, default=20)
+    actions_parser.add_argument("--homeworks", type=int, nargs="+", default=[10, 1000])
+    actions_parser.add_argument("--types", type=int, default=None)
+    actions_parser.add_argument("--slots", type=int, default=7)
+    actions_parser.add_argument("--repeat", type=int, default=3)
+    actions_parser.add_argument("--output", default="benchmark.json")
+    actions_parser.set_defaults(function=benchmark_actions)
+
+    compare_parser = subparsers.add_parser("compare", help=benchmark_compare.__doc__)
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.set_defaults(function=benchmark_compare)
+
+    startup_parser = subparsers.add_parser("startup", help=benchmark_startup.__doc__)
+    startup_parser.add_argument("--courses", type=int, default=20)
+    startup_parser.add_argument("--budget", type=int, default=300, help="in ms")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.set_defaults(function=benchmark_startup)
+
+    memory_parser = subparsers.add_parser("memory", help=benchmark_memory.__doc__)
+    memory_parser.add_argument("--courses", type=int, default=100)
+    memory_parser.add_argument("--homeworks", type=int, default=10000)
+    memory_parser.set_defaults(function=benchmark_memory)
+
+    arguments = parser.parse_args()
+    arguments.function(arguments)
@@ -1,5 +1,7 @@
 """A configuration file for the school script."""
+import os
 from dataclasses import dataclass
+from datetime import date
 
 
 @dataclass
@@ -18,6 +20,40 @@ courses_folder = "courses/"
 course_yaml = ".info.yaml"
 
 
+# name of the (hidden) folder inside the courses folder where parsed files are cached
+cache_folder = ".cache"
+
+
+# the number of threads listing the directories and of processes parsing the files when
+# the courses folder is scanned in parallel (--parallel, useful on network file systems);
+# the files are only parsed in parallel if there are enough of them to be worth it
+parallel_threads = 16
+parallel_processes = os.cpu_count() or 1
+parallel_parsing_threshold = 200
+
+
+# where the homework is stored: "yaml" (a file for each homework, in the .homework folder
+# of its course) or "sqlite" (a database in the courses folder, which is faster to query
+# when there is a lot of homework; see 'homework import' and 'homework export')
+homework_backend = "yaml"
+homework_database = "homework.sqlite"
+
+
+# the first day of the semester (e.g. date(2020, 10, 5)), for telling odd and even weeks
+# apart; if it is None, the courses are treated as if they were on every week
+semester_start = None
+
+# the number of weeks of the semester (for how long the exported courses repeat)
+semester_weeks = 14
+
+
+# the days (counting from monday) and the time (in minutes) that the timeline shows
+# (the courses outside of it are shown too; set the days to range(7) for weekends)
+timeline_days = range(5)
+timeline_start = 7 * 60 + 20
+timeline_end = 21 * 60
+
+
 # settings regarding course types
 # the numbers are ANSI colors that the course type will be painted with
 # see https://www.lihaoyi.com/post/BuildyourownCommandLinewithANSIescapecodes.html
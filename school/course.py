@@ -1,55 +1,69 @@
 """A module for defining and handling courses themselves."""
-import csv
 from datetime import date, datetime, timedelta
 from re import match, split
 from subprocess import call, Popen, DEVNULL
 
 import shutil
-import yaml
-from unidecode import unidecode
 
+from index import Index
+from schedule import WeeklySchedule, get_semester_week, partition
 from utilities import *
 
 
-@dataclass
+@dataclass(slots=True)
 class Teacher(Strict):
-    name: Union[str, List[str]]
+    name: Union[str, List[str]] = interned()
     email: Union[str, List[str]] = None
     website: str = None
     office: str = None
     note: str = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Classroom(Strict):
     address: str = None
     number: str = None
     floor: int = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Time(Strict):
-    day: str
+    day: str = interned()
     start: int
     end: int
-    weeks: str = None
+    weeks: str = interned(None)
+
+    def weekday(self) -> int:
+        """Get the weekday of the time (counting from 0)."""
+        return WD_EN.index(self.day.lower())
+
+    def is_in_week(self, week: Optional[int]) -> bool:
+        """Returns True if the time is in the given week of the semester (None meaning
+        that the week is unknown, in which case it is)."""
+        if week is None or self.weeks not in ("odd", "even"):
+            return True
+
+        return (week % 2 == 1) == (self.weeks == "odd")
+
+    def is_ongoing(self, now: datetime) -> bool:
+        """Returns True if the time is ongoing (now)."""
+        minutes = now.hour * 60 + now.minute
+
+        return (
+            now.weekday() == self.weekday()
+            and self.start <= minutes <= self.end
+            and self.is_in_week(get_semester_week(now))
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class Finals(Strict):
     date: date
     classroom: Classroom
 
 
-@dataclass
+@dataclass(slots=True)
 class Course(Strict):
-    # these three are not in the YAML itself, but instead added from the path to it
-    # -----------------------------------------------------------------------------
-    # name: str
-    # type: str
-    # abbreviation: str
-    # folder: str
-
     code: str = None
 
     teacher: Teacher = None
@@ -67,22 +81,41 @@ class Course(Strict):
     # left for legacy reasons
     resources: Union[str, List[str]] = None
 
-    def is_ongoing(self) -> bool:
-        """Returns True if the course is ongoing and False if not."""
-        today = datetime.today()
+    # these are not in the YAML itself, but instead added from the path to it
+    name: str = derived()
+    type: str = derived()
+    abbreviation: str = derived()
+    folder: str = derived()
+    semester: str = derived()
 
-        return (
-            False
-            if self.time is None
-            else (
-                    today.weekday() == self.weekday()
-                    and self.time.start <= today.hour * 60 + today.minute <= self.time.end
-            )
-        )
+    def is_ongoing(self, now: datetime = None) -> bool:
+        """Returns True if the course is ongoing (now) and False if not."""
+        now = now or datetime.now()
+        return any(slot.is_ongoing(now) for slot in self.slots())
 
     def weekday(self) -> int:
         """Get the weekday the course is on (counting from 0)."""
-        return WD_EN.index(self.time.day.lower())
+        return self.slots()[0].weekday()
+
+    def reference(self) -> Dict[str, str]:
+        """The attributes that identify the course (those taken from its path)."""
+        return {
+            "name": self.name,
+            "type": self.type,
+            "abbreviation": self.abbreviation,
+            "semester": self.semester,
+        }
+
+    def to_dictionary(self) -> Dict:
+        # (super() without arguments doesn't work in slotted dataclasses)
+        return {**self.reference(), **Strict.to_dictionary(self)}
+
+    def slots(self) -> List[Time]:
+        """Get the times of the course (a course can be on multiple times a week)."""
+        if self.time is None:
+            return []
+
+        return self.time if isinstance(self.time, list) else [self.time]
 
     def path(self, ignore_type: bool = False) -> str:
         """Returns the path of the course (possibly ignoring the type)."""
@@ -94,8 +127,9 @@ class Course(Strict):
         )
 
     @classmethod
-    def from_file(cls, path: str):
-        """Initialize a Course object from the path to its .yaml dictionary."""
+    def from_file(cls, path: str, dictionary: Dict = None, validate: bool = True):
+        """Initialize a Course object from the path to its .yaml dictionary (possibly
+        using its already parsed dictionary)."""
         # descend 2 levels down, getting the name of the course directory
         # not pretty, but functional
 
@@ -125,92 +159,242 @@ class Course(Strict):
         course_type = shortened_path[: shortened_path.index(os.sep)]
 
         if course_type not in course_types:
-            sys.exit(f"The course type '{course_type}' in '{name}' is not valid.")
+            exit_with_error(f"The course type '{course_type}' in '{name}' is not valid.")
 
-        course = Course._from_file(path)
+        course = Course._from_file(path, dictionary, validate)
 
-        course.name = name[: name.rfind(" ")]
-        course.type = course_type
-        course.abbreviation = abbreviation
-        course.folder = root
+        # the strings are shared by all of the courses of the folder/with the name
+        course.name = sys.intern(name[: name.rfind(" ")])
+        course.type = sys.intern(course_type)
+        course.abbreviation = sys.intern(abbreviation)
+        course.folder = sys.intern(root)
+        course.semester = sys.intern(os.path.basename(os.path.normpath(root)))
 
         return course
 
 
+class CourseSnapshot:
+    """All of the courses, loaded once and indexed in various ways."""
+
+    def __init__(self, courses: List[Course]):
+        self.courses = courses
+
+        # sorted by when they start during the week (unscheduled ones go first)
+        self.sorted = sorted(
+            courses,
+            key=lambda c: (0, 0) if not c.time else (c.weekday(), c.slots()[0].start),
+        )
+
+        self.scheduled = [c for c in self.sorted if c.time is not None]
+        self.unscheduled = [c for c in self.sorted if c.time is None]
+
+        # all times of the (scheduled) courses, sorted by when they are during the week
+        self.slots: List[Tuple[Course, Time]] = sorted(
+            ((course, slot) for course in self.scheduled for slot in course.slots()),
+            key=lambda pair: (pair[1].weekday(), pair[1].start),
+        )
+
+        self.by_abbreviation: Dict[str, List[Course]] = {}
+        self.by_type: Dict[str, List[Course]] = {}
+        self.by_weekday: Dict[int, List[Tuple[Course, Time]]] = {
+            i: [] for i in range(len(WD_EN))
+        }
+
+        for course in self.sorted:
+            self.by_abbreviation.setdefault(course.abbreviation.lower(), []).append(course)
+            self.by_type.setdefault(course.type, []).append(course)
+
+        for course, slot in self.slots:
+            self.by_weekday[slot.weekday()].append((course, slot))
+
+        self._lookup = None
+        self._schedule = None
+
+    @property
+    def schedule(self) -> WeeklySchedule:
+        """The index of the times of the (scheduled) courses during the week (built only
+        when it is first needed)."""
+        if self._schedule is None:
+            self._schedule = WeeklySchedule(self.scheduled)
+
+        return self._schedule
+
+    @property
+    def lookup(self):
+        """The index for looking up the (scheduled) courses by their names (built only
+        when it is first needed)."""
+        from lookup import CourseLookup
+
+        if self._lookup is None:
+            with timed("lookup"):
+                self._lookup = CourseLookup(self.scheduled)
+
+        return self._lookup
+
+
+def get_roots(folder: str) -> List[str]:
+    """Return the courses folders that the folder refers to: either the folder itself,
+    or the folders matching it, if it is a glob pattern (the folders of all semesters,
+    for example)."""
+    import glob
+
+    if not glob.has_magic(folder):
+        return [os.path.normpath(folder)]
+
+    roots = sorted(
+        os.path.normpath(path)
+        for path in glob.glob(os.path.expanduser(folder))
+        if os.path.isdir(path)
+    )
+
+    if len(roots) == 0:
+        exit_with_error(f"No courses folders match '{folder}'.")
+
+    return roots
+
+
 class Courses:
     """A class for working with all of the courses."""
 
-    def __init__(self, folder: str):
-        """Create a Courses object from a given string."""
+    def __init__(self, folder: str, parallel: bool = False):
+        """Create a Courses object from a given string (a folder, or a glob pattern
+        matching multiple folders, whose courses are merged). If parallel is True, the
+        folders are listed concurrently and the changed files are parsed in a process
+        pool."""
         self.folder = folder
+        self.parallel = parallel
+        self.roots = get_roots(folder)
+        self.indexes = {root: Index(root, parallel) for root in self.roots}
+        self._snapshot = None
+
+        # the paths of the course files of each of the roots that were loaded last
+        self.paths: Dict[str, List[str]] = {}
+
+    @property
+    def snapshot(self) -> CourseSnapshot:
+        """The snapshot of all courses (loaded only once per Courses object)."""
+        if self._snapshot is None:
+            self._snapshot = CourseSnapshot(self.get_courses())
+
+        return self._snapshot
+
+    def get_index(self, path: str) -> Index:
+        """Return the index of the root that the path is in."""
+        for root, index in self.indexes.items():
+            if path == root or path.startswith(os.path.join(root, "")):
+                return index
+
+        return self.indexes[self.roots[0]]
+
+    def parse(self, paths: List[str]) -> List[Dict]:
+        """Parse the YAML files (in a process pool, if parallel). All of the indexes
+        parse the same way, so the files don't have to be in the first one's root."""
+        return self.indexes[self.roots[0]].parse(paths)
+
+    def save_indexes(self):
+        """Save the indexes of all of the roots (those that changed)."""
+        for index in self.indexes.values():
+            index.save()
+
+    def _scan(self) -> Dict[str, Tuple[List[str], List[Tuple[Dict, bool]]]]:
+        """Walk all of the roots, returning the paths of their course files and their
+        parsed dictionaries. The roots are walked concurrently, since most of the time
+        is spent waiting for the file system, but the files are parsed on the main
+        thread (forking the parsing processes from other threads could deadlock)."""
+
+        def walk(root: str) -> List[str]:
+            with timed("walk"):
+                return self.indexes[root].walk()
+
+        if len(self.roots) == 1:
+            walked = [walk(self.roots[0])]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=min(len(self.roots), 8)) as executor:
+                walked = list(executor.map(walk, self.roots))
+
+        scanned = {}
+        for root, paths in zip(self.roots, walked):
+            index = self.indexes[root]
+
+            with timed("index"):
+                scanned[root] = (paths, index.get_all(paths))
+                index.prune(paths)
+
+        return scanned
+
+    def refresh(self):
+        """Drop the snapshot if any of the course files were added, removed or changed
+        since it was taken (only checking their modification times)."""
+        if self._snapshot is None:
+            return
+
+        misses = sum(index.misses for index in self.indexes.values())
+        scanned = self._scan()
+
+        if sum(index.misses for index in self.indexes.values()) != misses \
+                or any(paths != self.paths.get(root) for root, (paths, _) in scanned.items()):
+            self._snapshot = None
 
     def get_courses(self) -> List[Course]:
-        """Get all of the courses in no particular order."""
+        """Get all of the courses (of all of the roots) in no particular order. Only the
+        course files that changed since the last call are parsed again, the rest is
+        taken from the index. The types of the courses are only checked the first time
+        they are loaded (the index remembers which files passed the check)."""
         courses: List[Course] = []
 
-        for root, dirs, filenames in os.walk(self.folder, followlinks=True, topdown=True):
-            # skip hidden directories
-            dirs[:] = [d for d in dirs if not d[0] == '.']
+        for root, (paths, dictionaries) in self._scan().items():
+            self.paths[root] = paths
+
+            with timed("create courses"):
+                for path, (dictionary, validated) in zip(paths, dictionaries):
+                    courses.append(Course.from_file(path, dictionary, not validated))
 
-            # if course_yaml is a hidden file, also search for non-hidden variants
-            # (for backwards compatibility)
-            is_course_yaml = lambda f: f == course_yaml \
-                    or (course_yaml[0] == "." and f == course_yaml[1:])
+            # (a file that didn't pass the check exited with an error by now)
+            unvalidated = [p for p, (_, v) in zip(paths, dictionaries) if not v]
+            self.indexes[root].set_validated(unvalidated)
 
-            for filename in filter(is_course_yaml, filenames):
-                courses.append(Course.from_file(os.path.join(root, filename)))
+            count("courses validated", len(unvalidated))
+
+        # only saved now, so that the files that don't pass the validation (which exits)
+        # don't end up in the index
+        with timed("save index"):
+            self.save_indexes()
 
         return courses
 
     def get_sorted_courses(self, include_unscheduled=False) -> List[Course]:
         """Return the courses, sorted by when they start during the week."""
-        return sorted(
-            filter(
-                lambda c: c.time is not None or include_unscheduled, self.get_courses()
-            ),
-            key=lambda c: (0, 0) if not c.time else (c.weekday(), c.time.start),
-        )
+        if include_unscheduled:
+            return self.snapshot.sorted
+        else:
+            return self.snapshot.scheduled
 
-    def get_ongoing_course(self) -> Optional[Course]:
+    def get_ongoing_course(self, now: datetime = None) -> Optional[Course]:
         """Returns the currently ongoing course (or None if there is none)."""
-        for course in self.get_sorted_courses():
-            if course.is_ongoing():
-                return course
+        return self.snapshot.schedule.ongoing(now or datetime.now())
+
+    def get_course_from_argument(self, argument: str, now: datetime = None) -> List[Course]:
+        """Returns all courses that match the format name-[type] or abbreviation-[type].
+        The ongoing/next courses are the ones ongoing/next at the given time (now)."""
+        now = now or datetime.now()
 
-    def get_course_from_argument(self, argument: str) -> List[Course]:
-        """Returns all courses that match the format name-[type] or abbreviation-[type]."""
         # if no argument is specified, get the ongoing/next course
         if argument == "":
-            ongoing = self.get_ongoing_course()
+            ongoing = self.get_ongoing_course(now)
             return (
                 [ongoing]
                 if ongoing is not None
-                else self.get_course_from_argument("next")
+                else self.get_course_from_argument("next", now)
             )
 
         argument = argument.lower().strip()
 
         # special case for 'next'
         if argument in ("n", "next"):
-            today = datetime.today()
-
-            MID = 1440  # minutes in a day
-            MIW = 10080  # minutes in a week
-
-            current_week_time = today.weekday() * MID + today.hour * 60 + today.minute
-            min_time, min_course = float("+inf"), None
-
-            # find the course starting the soonest from now
-            for course in self.get_sorted_courses(include_unscheduled=False):
-                time_to_course = (
-                                         (course.time.start + course.weekday() * MID) - current_week_time
-                                 ) % MIW
-
-                if time_to_course < min_time:
-                    min_time = time_to_course
-                    min_course = course
-
-            return [min_course] if min_course is not None else []
+            course = self.snapshot.schedule.next(now)
+            return [course] if course is not None else []
 
         # try to interpret the argument as an abbreviation
         if "-" not in argument:
@@ -223,103 +407,129 @@ class Courses:
         # courses that were parsed as if the argument before - was an abbreviation
         abbr_courses = [
             course
-            for course in self.get_sorted_courses(include_unscheduled=True)
-            if c_abbr == course.abbreviation.lower()
-               and c_type in (None, course.type[0])
+            for course in self.snapshot.by_abbreviation.get(c_abbr, [])
+            if c_type in (None, course.type[0])
         ]
 
-        # courses that were parsed as if the argument before - was a name
-        name_courses = [
-            course
-            for course in self.get_sorted_courses()
-            if unidecode(course.name.lower()).startswith(unidecode(c_abbr.lower()))
-               and c_type in {None, course.type[0]}
-        ]
+        if len(abbr_courses) != 0:
+            return abbr_courses
 
-        # return the courses for argument as an abbreviation or for argument as a name
-        return abbr_courses if len(abbr_courses) != 0 else name_courses
+        # if no abbreviation matches, try to parse the argument before - as a name
+        lookup = self.snapshot.lookup
 
-    def list(self, option: str = "", short=False, **kwargs):
+        with timed("lookup"):
+            name_courses = [
+                course
+                for course in lookup.by_name_prefix(c_abbr)
+                if c_type in {None, course.type[0]}
+            ]
+
+        if len(name_courses) != 0:
+            return name_courses
+
+        # if nothing matches, the name/abbreviation might be misspelled
+        with timed("lookup"):
+            fuzzy_courses = [
+                (score, course)
+                for score, course in lookup.fuzzy(c_abbr)
+                if c_type in {None, course.type[0]}
+            ]
+
+        return [c for s, c in fuzzy_courses if s == fuzzy_courses[0][0]]
+
+    def list(self, option: str = "", short=False, format="table", **kwargs):
         """Lists information about the courses."""
-        courses = self.get_sorted_courses()
+        courses = self.snapshot.scheduled
 
-        if option == "plain":
+        if option == "plain" and format == "table":
             if short:
                 for course in sorted(courses, key=lambda x: x.name + x.type):
                     print(f"{course.name} ({course.type})")
             else:
                 for course in sorted(courses, key=lambda x: x.abbreviation + x.type):
                     print(f"{course.abbreviation}-{course.type[0]}")
-            quit()
+            return
 
         current_day = datetime.today()
         current_weekday = current_day.weekday()
 
-        # split to scheduled and non-scheduled
-        unscheduled = [c for c in self.get_courses() if c.time is None]
-        courses = [c for c in courses if c not in unscheduled]
+        unscheduled = self.snapshot.unscheduled
 
         table = []
         option = option.lower()
 
-        for i, course in enumerate(courses):
-            # lambda functions to test for various options
-            # a is current weekday and b is the course's weekday
-            options = {
-                "": lambda _, __: True,  # all of them
-                "t": lambda a, b: a == b,  # today
-                "tm": lambda a, b: (a + 1) % 7 == b,  # tomorrow
-                "mo": lambda a, b: b == 0,
-                "tu": lambda a, b: b == 1,
-                "we": lambda a, b: b == 2,
-                "th": lambda a, b: b == 3,
-                "fr": lambda a, b: b == 4,
-                "sa": lambda a, b: b == 5,
-                "su": lambda a, b: b == 6,
-            }
-
-            if option not in options:
-                exit_with_error("Invalid course-listing option!")
-
-            if options[option](current_weekday, course.weekday()):
-                # include the name of the day before first day's course
-                if courses[i - 1].time.day != courses[i].time.day:
-                    weekday = course.time.day.capitalize()
-
-                    # calculate the next occurrence
-                    date = (
-                            current_day
-                            + timedelta(days=(course.weekday() - current_weekday) % 7)
-                    ).strftime("%-d. %-m.")
-
-                    table.append([f"{weekday if not short else weekday[:3]} / {date}"])
-
-                # for possibly surrounding the name with chars if it's ongoing
-                name_surround_char = "> " if course.is_ongoing() else ""
-
-                row = [
-                    f"{name_surround_char}{course.name if not short else course.abbreviation}",
-                    f"{minutes_to_HHMM(course.time.start)} -"
-                    f" {minutes_to_HHMM(course.time.end)}"
-                    + (
-                        ""
-                        if course.time.weeks is None
-                        else (
-                            f" ({course.time.weeks if not short else course.time.weeks[0]})"
-                        )
-                    ),
-                    "-" if course.classroom is None else course.classroom.number,
-                ]
+        # the weekday for the various options (None means all of them)
+        options = {
+            "": None,
+            "plain": None,  # (for the other formats than table)
+            "t": current_weekday,  # today
+            "tm": (current_weekday + 1) % 7,  # tomorrow
+            "mo": 0,
+            "tu": 1,
+            "we": 2,
+            "th": 3,
+            "fr": 4,
+            "sa": 5,
+            "su": 6,
+        }
+
+        if option not in options:
+            exit_with_error("Invalid course-listing option!")
+
+        # a course is listed once for each of its times
+        slots = (
+            self.snapshot.slots
+            if options[option] is None
+            else self.snapshot.by_weekday[options[option]]
+        )
 
-                # if the course type is something-number, add the number in parentheses
-                if course.type[-1].isnumeric():
-                    row[0] += f" ({course.type[-1]})"
+        if format != "table":
+            # (a course with more times on the listed days is only in the records once)
+            courses = list({id(course): course for course, _ in slots}.values())
 
-                # color the course name the appropriate color, depending on its type
-                row[0] = Ansi.color(row[0], course_types[course.type].color)
+            print_records(
+                (c.to_dictionary() for c in courses + (unscheduled if option == "" else [])),
+                format,
+            )
+            return
+
+        for i, (course, slot) in enumerate(slots):
+            # include the name of the day before first day's course
+            if i == 0 or slots[i - 1][1].weekday() != slot.weekday():
+                weekday = slot.day.capitalize()
+
+                # calculate the next occurrence
+                date = (
+                        current_day
+                        + timedelta(days=(slot.weekday() - current_weekday) % 7)
+                ).strftime("%-d. %-m.")
+
+                table.append([f"{weekday if not short else weekday[:3]} / {date}"])
+
+            # for possibly surrounding the name with chars if it's ongoing
+            name_surround_char = "> " if slot.is_ongoing(current_day) else ""
+
+            row = [
+                f"{name_surround_char}{course.name if not short else course.abbreviation}",
+                f"{minutes_to_HHMM(slot.start)} -"
+                f" {minutes_to_HHMM(slot.end)}"
+                + (
+                    ""
+                    if slot.weeks is None
+                    else (f" ({slot.weeks if not short else slot.weeks[0]})")
+                ),
+                "-" if course.classroom is None else course.classroom.number,
+            ]
+
+            # if the course type is something-number, add the number in parentheses
+            if course.type[-1].isnumeric():
+                row[0] += f" ({course.type[-1]})"
 
-                # append useful information
-                table.append(row)
+            # color the course name the appropriate color, depending on its type
+            row[0] = Ansi.color(row[0], course_types[course.type].color)
+
+            # append useful information
+            table.append(row)
 
         # list unscheduled courses only when no options are specified
         if option == "" and len(unscheduled) != 0:
@@ -341,14 +551,24 @@ class Courses:
 
         print_table(table)
 
-    def finals(self, short=False, **kwargs):
+    def finals(self, short=False, format="table", **kwargs):
         """Lists dates of all finals."""
         # get courses that have finals records in them
         finals_courses = [c for c in self.get_sorted_courses(include_unscheduled=True) if c.finals is not None]
 
+        if format != "table":
+            print_records(
+                (
+                    {"course": c.reference(), **c.finals.to_dictionary()}
+                    for c in sorted(finals_courses, key=lambda c: c.finals.date)
+                ),
+                format,
+            )
+            return
+
         if len(finals_courses) == 0:
             print("No finals added yet!")
-            sys.exit(0)
+            return
 
         # build a table
         finals = [["Finals!"]]
@@ -363,18 +583,22 @@ class Courses:
             if delta.days < 0:
                 due_msg = "done"
 
-            finals.append(
-                [
-                    Ansi.color(
-                        course.abbreviation if short else course.name,
-                        course_types[course.type].color,
-                    ),
-                    final.date.strftime("%_d. %-m. %Y"),
-                    final.date.strftime("%_H:%M"),
-                    due_msg,
-                    str(final.classroom.number),
-                ]
-            )
+            row = [
+                Ansi.color(
+                    course.abbreviation if short else course.name,
+                    course_types[course.type].color,
+                ),
+                final.date.strftime("%_d. %-m. %Y"),
+                final.date.strftime("%_H:%M"),
+                due_msg,
+                str(final.classroom.number),
+            ]
+
+            # the finals of multiple semesters are told apart by their semester
+            if len(self.roots) > 1:
+                row.insert(0, course.semester)
+
+            finals.append(row)
 
         print_table(finals)
 
@@ -385,8 +609,20 @@ class Courses:
             """Round to multiple."""
             return int(multiple * round(float(n) / multiple))
 
-        beginning_minutes = 7 * 60 + 20  # starting time is 7:20
-        end_minutes = 21 * 60  # ending time is 21:00
+        # the (weekday, start, end, course) of each of the times of the courses
+        slots = sorted(
+            (
+                (slot.weekday(), rtm(slot.start), rtm(slot.end), course)
+                for course in self.get_sorted_courses(include_unscheduled=False)
+                for slot in course.slots()
+            ),
+            key=lambda slot: slot[:2],
+        )
+
+        # the days/times from the configuration, extended so that all courses fit
+        weekdays = sorted(set(timeline_days) | {slot[0] for slot in slots})
+        beginning_minutes = min([timeline_start] + [slot[1] for slot in slots])
+        end_minutes = max([timeline_end] + [slot[2] for slot in slots])
 
         interval = 100  # 100 minutes for each period (90 + 10)
 
@@ -394,21 +630,23 @@ class Courses:
         number_of_intervals = total_minutes // interval
 
         segments = total_minutes // 10
-        days = {i: [[' '] * segments + ['│']] for i in range(5)}
+        days = {i: [] for i in weekdays}
+
+        # place the courses of each day into the minimum number of rows (the times are
+        # offset by their weekday, so the courses of different days never overlap)
+        lanes = partition([(d * 24 * 60 + s, d * 24 * 60 + e) for d, s, e, _ in slots])
+
+        for (weekday, start, end, course), lane in zip(slots, lanes):
+            while len(days[weekday]) <= lane:
+                days[weekday].append([' '] * segments + ['│'])
 
-        for course in self.get_sorted_courses(include_unscheduled=False):
-            i = (rtm(course.time.start) - beginning_minutes) // 10
-            width = (rtm(course.time.end) - rtm(course.time.start)) // 10
+            row = days[weekday][lane]
 
-            day = 0
-            for j in range(i, i + width):
-                if days[course.weekday()][day][j] != ' ':
-                    day += 1
-                    if len(days[course.weekday()]) == day:
-                        days[course.weekday()].append([' '] * segments + ['│'])
+            i = (start - beginning_minutes) // 10
+            width = (end - start) // 10
 
-            days[course.weekday()][day][i] = '{'
-            days[course.weekday()][day][i + width - 1] = '}'
+            row[i] = '{'
+            row[i + width - 1] = '}'
 
             space = width - 2  # width minus { and }
 
@@ -420,14 +658,12 @@ class Courses:
             )
 
             # TODO: this doesn't center correctly, for some reason
-            name = Ansi.center(name, space)
-
-            days[course.weekday()][day][i + 1] = name
+            row[i + 1] = Ansi.center(name, space)
             for j in range(i + 2, i + width - 1):
-                days[course.weekday()][day][j] = ''
+                row[j] = ''
 
-        # print the header
-        print(
+        # the header
+        output = [
             ("     ╭" + "─" * (total_minutes // 10) + "╮\n     │")
             + "".join(
                 Ansi.bold(
@@ -443,21 +679,18 @@ class Courses:
                 + ("─" if i != number_of_intervals - 1 else "┤")
                 for i in range(number_of_intervals)
             )
-        )
-
-        for i in range(5):
-            x = f"│ {WD_EN[i][:2].capitalize()} │"
-
-            for j, day in enumerate(days[i]):
-                if j == 0:
-                    print(x, end="")
-                else:
-                    print("│    │", end="")
+        ]
 
-                print("".join(day))
+        for i in weekdays:
+            # days without courses still get an (empty) row
+            for j, row in enumerate(days[i] or [[' '] * segments + ['│']]):
+                output.append(
+                    (f"│ {WD_EN[i][:2].capitalize()} │" if j == 0 else "│    │")
+                    + "".join(row)
+                )
 
-        # print the very last line
-        print(
+        # the very last line
+        output.append(
             "╰────┴─"
             + "".join(
                 "─" * number_of_intervals
@@ -466,6 +699,8 @@ class Courses:
             )
         )
 
+        print("\n".join(output))
+
     def open(self, kind: str, option: str = "", **kwargs):
         """Open the course's something."""
 
@@ -563,8 +798,60 @@ class Courses:
             else:
                 exit_with_error("Multiple courses matching.")
 
-    def initialize(self, cwd: str, option: str = "", **kwargs):
-        """Initialize a new year from a CSV from SIS (found in Rozvrh NG -> CSV)."""
+    def get_indexed_abbreviations(self) -> List[str]:
+        """Return the abbreviations of the courses (with and without the course type)
+        from the directories in the index, i.e. without parsing anything."""
+        abbreviations = set()
+
+        directories = [d for index in self.indexes.values() for d in index.dirs.items()]
+
+        for directory, (_, _, filenames) in directories:
+            course_type = os.path.basename(directory)
+            name = os.path.basename(os.path.dirname(directory))
+            abbreviation = name[name.rfind(" ") + 1:]
+
+            if len(filenames) == 0 or course_type not in course_types \
+                    or not (abbreviation.startswith("(") and abbreviation.endswith(")")):
+                continue
+
+            abbreviation = abbreviation[1:-1].lower()
+            abbreviations |= {abbreviation, f"{abbreviation}-{course_type[0]}"}
+
+        return sorted(abbreviations)
+
+    def rebuild_index(self, **kwargs):
+        """Throw away the course index and build it again from scratch."""
+        for index in self.indexes.values():
+            index.clear()
+
+        self._snapshot = None
+
+        print_success(
+            f"Index rebuilt ({len(self.snapshot.courses)} course files parsed)."
+        )
+
+    def index_stats(self, **kwargs):
+        """Print statistics about the course index (of each of the roots)."""
+        self.snapshot
+
+        table = []
+        for root, index in self.indexes.items():
+            size = os.path.getsize(index.path) if os.path.exists(index.path) else 0
+
+            table += [
+                ["Index" if len(self.roots) == 1 else f"Index ({root})"],
+                ["path", index.path],
+                ["size", f"{size / 1024:.1f} kB"],
+                ["directories", str(len(index.dirs))],
+                ["course files", str(len(self.paths[root]))],
+                ["hits / misses", f"{index.hits} / {index.misses}"],
+            ]
+
+        print_table(table)
+
+    def read_schedule(self, path: str) -> Iterator[Tuple[str, str, str, Dict]]:
+        """Read the rows of a CSV from SIS (found in Rozvrh NG -> CSV) one by one,
+        yielding the name, abbreviation and type of each course and its dictionary."""
 
         def recursive_dictionary_clear(d):
             """Recursively clear dictionary keys with empty values."""
@@ -603,29 +890,17 @@ class Courses:
             l = [i for i in l if i not in (",", "")]
             return " / ".join([" ".join(list(reversed(i.split()))) for i in l])
 
-        if option == "":
-            exit_with_error("No CSV to initialize from specified.")
-
-        path = os.path.join(cwd, option)
-
-        if not os.path.exists(path):
-            exit_with_error("CSV file doesn't exist.")
-
-        if os.path.exists(courses_folder):
-            if len(os.listdir(courses_folder)) != 0:
-                exit_with_error("Courses folder non-empty, not initializing.")
-        else:
-            os.mkdir(courses_folder)
+        import csv
 
-        with open(path, "rb") as f:
-            # SIS uses cp1250 :(
-            contents = f.read().decode("cp1250")
+        # SIS uses cp1250 :(
+        with open(path, "r", encoding="cp1250", newline="") as f:
+            rows = csv.reader(f, delimiter=";")
 
-            course_count = 0
-            course_name_set = set()
+            # skip the header
+            next(rows, None)
 
-            for l in list(csv.reader(contents.splitlines(), delimiter=";"))[1:]:
-                uid, _, code, name, day, start, self, dur, _, _, _, weeks, teacher = l
+            for l in rows:
+                uid, _, code, name, day, start, room, dur, _, _, _, weeks, teacher = l
 
                 teacher = format_teacher(teacher)
 
@@ -635,7 +910,7 @@ class Courses:
                 # 'something' and x -> x
                 out = {
                     "teacher": {"name": teacher},
-                    "classroom": {"number": self},
+                    "classroom": {"number": room},
                     "time": {
                         "day": day and WD_EN[int(day) - 1].capitalize(),
                         "start": start and int(start),  # TODO HH:MM formatting
@@ -662,21 +937,169 @@ class Courses:
                     ]
                 )
 
-                course_name_set.add(name)
-
-                # create the directory with the name of the course
-                course_dir = os.path.join(courses_folder, f"{name} ({abbreviation})")
-                os.makedirs(course_dir, exist_ok=True)
-
                 # lecture / lab
                 # based on the ID of the SIS ticket - labs end with x** and lectures with p*
                 course_type = "přednáška" if uid[:-1].endswith("p") else "cvičení"
 
-                os.makedirs(os.path.join(course_dir, course_type), exist_ok=True)
+                yield name, abbreviation, course_type, out
+
+    def _get_schedule_path(self, cwd: str, option: str) -> str:
+        """Return the path of the CSV to initialize/update the courses from."""
+        if option == "":
+            exit_with_error("No CSV to initialize from specified.")
+
+        path = os.path.join(cwd, option)
+
+        if not os.path.exists(path):
+            exit_with_error("CSV file doesn't exist.")
+
+        if len(self.roots) != 1:
+            exit_with_error("Can't initialize multiple courses folders at once.")
+
+        return path
+
+    def initialize(self, cwd: str, option: str = "", update=False, **kwargs):
+        """Initialize a new year from a CSV from SIS (found in Rozvrh NG -> CSV), or
+        update the existing courses from it."""
+        import yaml
+
+        path = self._get_schedule_path(cwd, option)
+        folder = self.roots[0]
+
+        if update:
+            return self.update(path)
+
+        if os.path.exists(folder):
+            # the cache and the homework database aren't courses
+            if len(set(os.listdir(folder)) - {cache_folder, homework_database}) != 0:
+                exit_with_error(
+                    "Courses folder non-empty, not initializing (use --update to update it)."
+                )
+        else:
+            os.mkdir(folder)
+
+        course_count = 0
+        course_name_set = set()
+
+        for name, abbreviation, course_type, out in self.read_schedule(path):
+            course_name_set.add(name)
+
+            # create the directory with the name of the course and its type
+            course_dir = os.path.join(folder, f"{name} ({abbreviation})")
+            os.makedirs(os.path.join(course_dir, course_type), exist_ok=True)
+
+            with open(os.path.join(course_dir, course_type, course_yaml), "w") as f:
+                yaml.dump(out, stream=f, allow_unicode=True)
+
+            course_count += 1
+
+        print_success(f"New semester with {len(course_name_set)} courses ({course_count} lectures/tutorials) initialized.")
 
-                with open(os.path.join(course_dir, course_type, course_yaml), "w") as f:
-                    yaml.dump(out, stream=f, allow_unicode=True)
+    def update(self, path: str):
+        """Update the courses from a CSV from SIS, matching them by their code and type.
+        Only the course files whose contents changed are written (the other attributes
+        of the courses, their notes and homework are left alone)."""
+        import yaml
 
-                course_count += 1
+        folder = self.roots[0]
+        index = self.indexes[folder]
 
-        exit_with_success(f"New semester with {len(course_name_set)} courses ({course_count} lectures/tutorials) initialized.")
+        # (code, type) -> (path, dictionary) of the existing course files, and the
+        # directories of the existing courses (so new types go to the same directory)
+        existing: Dict[Tuple[str, str], Tuple[str, Dict]] = {}
+        course_dirs: Dict[str, str] = {}
+
+        paths = index.walk()
+        for course_path, (dictionary, _) in zip(paths, index.get_all(paths)):
+            code = dictionary.get("code")
+            course_type = os.path.basename(os.path.dirname(course_path))
+
+            existing[(code, course_type)] = (course_path, dictionary)
+            course_dirs.setdefault(code, os.path.dirname(os.path.dirname(course_path)))
+
+        # there is only one course file for each code and type, so when the CSV has
+        # more different rows of a course (parallel tutorials or lectures at different
+        # times), it isn't clear which one to use -- such courses are reported instead
+        scheduled: Dict[Tuple[str, str], Tuple[str, str, Dict]] = {}
+        conflicting: Dict[Tuple[str, str], List[Dict]] = {}
+        for name, abbreviation, course_type, out in self.read_schedule(path):
+            key = (out.get("code"), course_type)
+
+            if key in conflicting:
+                conflicting[key].append(out)
+            elif key in scheduled and scheduled[key][2] != out:
+                conflicting[key] = [scheduled[key][2], out]
+            else:
+                scheduled[key] = (name, abbreviation, out)
+
+        conflicts = []
+        for key, outs in conflicting.items():
+            name = scheduled.pop(key)[0]
+
+            slots = []
+            for out in outs:
+                when = out.get("time", {})
+                slots.append(
+                    f"{when.get('day', '?')} {minutes_to_HHMM(when['start']).strip()}"
+                    if "start" in when else "?"
+                )
+
+            conflicts.append(
+                [f"{name} ({key[1]})", f"conflicting rows ({', '.join(slots)}), not updated"]
+            )
+
+        added, changed, unchanged = [], [], 0
+
+        for (code, course_type), (name, abbreviation, out) in scheduled.items():
+            if (code, course_type) in existing:
+                course_path, dictionary = existing[(code, course_type)]
+
+                # the attributes from the CSV replace the existing ones (the time as a
+                # whole, the others only in the keys that the CSV has)
+                new = dict(dictionary)
+                for key, value in out.items():
+                    if key != "time" and isinstance(value, dict) \
+                            and isinstance(new.get(key), dict):
+                        new[key] = {**new[key], **value}
+                    else:
+                        new[key] = value
+
+                if new == dictionary:
+                    unchanged += 1
+                    continue
+
+                atomic_write(course_path, yaml.dump(new, allow_unicode=True))
+
+                keys = sorted(k for k in new.keys() | dictionary.keys()
+                              if new.get(k) != dictionary.get(k))
+                changed.append([f"{name} ({course_type})", ", ".join(keys)])
+            else:
+                course_dir = course_dirs.get(code) \
+                             or os.path.join(folder, f"{name} ({abbreviation})")
+                os.makedirs(os.path.join(course_dir, course_type), exist_ok=True)
+
+                atomic_write(
+                    os.path.join(course_dir, course_type, course_yaml),
+                    yaml.dump(out, allow_unicode=True),
+                )
+
+                added.append([f"{name} ({course_type})", "added"])
+
+        # the courses that aren't in the CSV anymore are kept (they might have notes
+        # or homework), but they are reported
+        removed = []
+        for (code, course_type), (course_path, _) in existing.items():
+            if code is not None and (code, course_type) not in scheduled \
+                    and (code, course_type) not in conflicting:
+                name = os.path.basename(os.path.dirname(os.path.dirname(course_path)))
+                removed.append([f"{name[: name.rfind(' ')]} ({course_type})", "not in the CSV"])
+
+        if len(added + changed + removed + conflicts) != 0:
+            print_table([["Changes"]] + added + changed + removed + conflicts)
+
+        print_success(
+            f"Courses updated ({len(added)} added, {len(changed)} changed,"
+            f" {unchanged} unchanged, {len(removed)} not in the CSV"
+            + (f", {len(conflicts)} with conflicting rows" if conflicts else "")
+            + ")."
+        )
@@ -0,0 +1,170 @@
+"""A module for the resident daemon of the school script. The daemon keeps the courses
+loaded and answers the commands of the script over a unix socket, so the commands
+don't have to load (or even import) anything themselves."""
+import socket
+import zlib
+
+from utilities import *
+
+
+def get_socket_path(folder: str) -> str:
+    """Return the path of the socket of the daemon serving the given courses folder."""
+    runtime_folder = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    folder_hash = zlib.crc32(os.path.realpath(folder).encode())
+
+    return os.path.join(runtime_folder, f"school-{os.getuid()}-{folder_hash:08x}.sock")
+
+
+def send(connection: socket.socket, message: Dict):
+    """Send a message (a JSON dictionary) and close the sending side."""
+    import json
+
+    connection.sendall(json.dumps(message).encode())
+    connection.shutdown(socket.SHUT_WR)
+
+
+def receive(connection: socket.socket) -> Dict:
+    """Receive a message (a JSON dictionary), reading until the other side closes."""
+    import json
+
+    chunks = []
+    while True:
+        chunk = connection.recv(1 << 16)
+
+        if not chunk:
+            return json.loads(b"".join(chunks))
+
+        chunks.append(chunk)
+
+
+def forward(argv: List[str], folder: str) -> Optional[int]:
+    """Forward the command to the daemon serving the folder, printing its output and
+    returning its exit code. Returns None if no daemon is running or if the command
+    has to run in the script itself."""
+    path = get_socket_path(folder)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            send(connection, {"argv": argv})
+            response = receive(connection)
+    except (OSError, ValueError):
+        return None
+
+    if response.get("fallback"):
+        return None
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+
+    return response["code"]
+
+
+def handle(request: Dict, courses, homeworks) -> Dict:
+    """Run the command of the request, returning its output and exit code."""
+    import io
+    from contextlib import redirect_stderr, redirect_stdout
+
+    from actions import (
+        complete, get_action_tree, get_exit_code, get_parser, is_interactive, resolve, run
+    )
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            arguments = get_parser().parse_intermixed_args(request["argv"])
+            tree = get_action_tree(courses, homeworks, os.getcwd())
+
+            if arguments.complete:
+                for completion in complete(tree, arguments.actions, courses, homeworks):
+                    print(completion)
+
+                return {"code": 0, "stdout": stdout.getvalue(), "stderr": ""}
+
+            function, path, actions = resolve(tree, arguments.actions)
+
+            if is_interactive(path):
+                return {"fallback": True}
+
+            # drop the loaded courses if some of them changed in the meantime
+            courses.refresh()
+
+            run(function, actions, arguments)
+            code = 0
+        except SystemExit as e:
+            code = get_exit_code(e)
+        except Exception:
+            # a bug in an action shouldn't take the daemon down with it (but shutting
+            # it down, which isn't an Exception, should)
+            import traceback
+
+            traceback.print_exc()
+            code = 1
+
+    return {"code": code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+class Shutdown(BaseException):
+    """Raised by SIGTERM to stop the daemon (a SystemExit would be caught as the exit
+    of the command that is being handled)."""
+
+
+def shutdown(signal_number, frame):
+    raise Shutdown
+
+
+def serve(courses, homeworks, **kwargs):
+    """Serve the commands for the courses folder until interrupted."""
+    from signal import signal, SIGINT, SIGTERM, default_int_handler
+
+    path = get_socket_path(courses.folder)
+
+    # the script ignores SIGINT, but the daemon should be stoppable by it (and by
+    # SIGTERM), cleaning up its socket
+    signal(SIGINT, default_int_handler)
+    signal(SIGTERM, shutdown)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # if the socket exists, it's either used by a running daemon or left over
+    if os.path.exists(path):
+        try:
+            server.connect(path)
+            exit_with_error(f"The daemon is already running ({path}).")
+        except ConnectionRefusedError:
+            os.remove(path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # only the user can connect to the socket
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+
+    server.listen()
+
+    # load everything before the first command arrives
+    courses.snapshot
+
+    print(f"Serving '{courses.folder}' on {path}.")
+
+    try:
+        while True:
+            connection, _ = server.accept()
+
+            with connection:
+                try:
+                    send(connection, handle(receive(connection), courses, homeworks))
+                except (OSError, ValueError):
+                    pass
+    except (KeyboardInterrupt, Shutdown):
+        pass
+    finally:
+        server.close()
+        os.remove(path)
@@ -0,0 +1,203 @@
+"""A module for storing the homework in an SQLite database (an alternative to the YAML
+files in the .homework folders of the courses, see homework_backend in config.py)."""
+from datetime import date, datetime
+
+from utilities import *
+
+# the columns of a row of the homework table
+COLUMNS = ("uid", "course", "file", "completed", "name", "description", "deadline", "source")
+
+# the deadlines that are dates or datetimes (i.e. not the special ones)
+DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS homework (
+    uid TEXT PRIMARY KEY,
+    course TEXT NOT NULL,       -- the path of the course, relative to the courses folder
+    file TEXT NOT NULL,         -- the name of its file in the .homework folder
+    completed INTEGER NOT NULL,
+    name TEXT,
+    description TEXT,
+    deadline TEXT,              -- in the ISO format (so it sorts chronologically)
+    source TEXT NOT NULL        -- the YAML of the homework, as it was written
+);
+CREATE INDEX IF NOT EXISTS homework_by_course ON homework (course, completed, deadline);
+CREATE INDEX IF NOT EXISTS homework_by_deadline ON homework (completed, deadline);
+"""
+
+
+def to_deadline(value: Optional[str]) -> Union[date, datetime, str, None]:
+    """Convert a deadline stored in the database back to the value it had in YAML."""
+    if value is None:
+        return None
+
+    try:
+        if len(value) == 10:
+            return date.fromisoformat(value)
+        elif "T" in value:
+            return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+
+    # a special deadline, like 'next course'
+    return value
+
+
+def from_deadline(value: Union[date, datetime, str, None]) -> Optional[str]:
+    """Convert a deadline to the way it is stored in the database."""
+    return value.isoformat() if isinstance(value, date) else value
+
+
+class HomeworkDatabase:
+    """The homework of a courses folder, stored in an SQLite database. Besides its
+    fields, the source (the YAML) of each homework is kept, so the homework can be
+    exported back to the files exactly as it was imported."""
+
+    # bump when the schema changes
+    VERSION = 1
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.path = os.path.join(folder, homework_database)
+        self._connection = None
+
+    @property
+    def connection(self):
+        """The connection to the database (created, along with the database, only when
+        it is first needed)."""
+        if self._connection is None:
+            import sqlite3
+
+            try:
+                self._connection = sqlite3.connect(self.path)
+
+                version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+                if version > self.VERSION:
+                    exit_with_error("The homework database is of a newer version.", self.path)
+
+                with self._connection:
+                    self._connection.executescript(SCHEMA)
+                    self._connection.execute(f"PRAGMA user_version = {self.VERSION}")
+            except sqlite3.Error as e:
+                exit_with_error(f"Can't open the homework database ({e}).", self.path)
+
+        return self._connection
+
+    def exists(self) -> bool:
+        """Return True if the database was already created."""
+        return self._connection is not None or os.path.exists(self.path)
+
+    def _select(self, where: str = "", parameters: Iterable = ()) -> List[Tuple]:
+        with timed("database"):
+            rows = self.connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM homework {where}", tuple(parameters)
+            ).fetchall()
+
+        count("database rows", len(rows))
+        return rows
+
+    def get_uids(self) -> List[str]:
+        """Return the UIDs of all of the homework."""
+        with timed("database"):
+            return [uid for uid, in self.connection.execute("SELECT uid FROM homework")]
+
+    def get_by_uid(self, uids: Iterable[str]) -> List[Tuple]:
+        """Return the rows of the homework with the given UIDs."""
+        uids = list(uids)
+        return self._select(f"WHERE uid IN ({', '.join('?' * len(uids))})", uids)
+
+    def get(
+        self,
+        courses: Optional[List[str]] = None,
+        completed: bool = False,
+        undeadlined: bool = True,
+        limit: int = None,
+        before: datetime = None,
+    ) -> List[Tuple]:
+        """Return the rows of the homework (of the given courses, or of all of them),
+        sorted by their deadlines (the homework without one goes last, and so does the
+        homework with a special deadline, like 'next course' -- without undeadlined,
+        neither is returned). If limit is given, only that many rows are returned; if
+        before is, only the rows of the homework due before it (and with a date
+        deadline) are."""
+        conditions, parameters = [], []
+
+        if courses is not None:
+            conditions.append(f"course IN ({', '.join('?' * len(courses))})")
+            parameters += courses
+
+        if not completed:
+            conditions.append("completed = 0")
+
+        if before is not None:
+            # the dates (as opposed to datetimes) sort before the datetimes of the same
+            # day, so a midnight is compared as a date to count them as midnights too
+            midnight = before.time() == datetime.min.time()
+
+            conditions.append("deadline < ?")
+            parameters.append(before.date().isoformat() if midnight else before.isoformat())
+
+        where = " AND ".join(conditions)
+
+        # the rows with and without deadline are selected separately, so that both of
+        # the queries can use the (course/completed, deadline) indexes for sorting
+        rows = self._select(
+            f"WHERE {where + ' AND ' if where else ''}"
+            + ("deadline IS NOT NULL" if undeadlined else f"deadline GLOB '{DATE_GLOB}'")
+            + " ORDER BY deadline"
+            + (f" LIMIT {int(limit)}" if limit is not None else ""),
+            parameters,
+        )
+
+        if undeadlined and before is None and (limit is None or len(rows) < limit):
+            rows += self._select(
+                f"WHERE {where + ' AND ' if where else ''}deadline IS NULL"
+                + (f" LIMIT {int(limit) - len(rows)}" if limit is not None else ""),
+                parameters,
+            )
+
+        return rows
+
+    def get_all(self) -> Iterator[Tuple]:
+        """Yield the rows of all of the homework (in the order they were added), reading
+        them from the database as they are needed."""
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM homework ORDER BY rowid"
+        )
+
+        rows = 0
+        try:
+            for row in cursor:
+                rows += 1
+                yield row
+        finally:
+            cursor.close()
+            count("database rows", rows)
+
+    def put(self, rows: Iterable[Tuple]):
+        """Add the rows, replacing the homework with the same UIDs."""
+        with timed("database"), self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO homework ({', '.join(COLUMNS)})"
+                f" VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+
+    def replace(self, uid: str, row: Tuple):
+        """Replace the homework with the UID by the row (whose UID might differ)."""
+        import sqlite3
+
+        try:
+            with timed("database"), self.connection:
+                self.connection.execute(
+                    f"UPDATE homework SET {', '.join(c + ' = ?' for c in COLUMNS)}"
+                    " WHERE uid = ?",
+                    tuple(row) + (uid,),
+                )
+        except sqlite3.IntegrityError:
+            exit_with_error(f"A homework with UID '{row[0]}' already exists.")
+
+    def delete(self, uid: str):
+        """Delete the homework with the UID."""
+        with timed("database"), self.connection:
+            self.connection.execute("DELETE FROM homework WHERE uid = ?", (uid,))
@@ -0,0 +1,282 @@
+"""A module for exporting the courses (their times and finals) and the homework
+deadlines to other formats, currently iCalendar."""
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+
+from homework import HW_FOLDER
+from utilities import *
+
+# bump when the exported calendar changes (so the cached ones are not used)
+ICS_VERSION = 2
+
+
+def escape_ics(text: str) -> str:
+    """Escape the text for an iCalendar property value."""
+    return (
+        str(text)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_ics(line: str) -> str:
+    """Fold the iCalendar content line so that no line is longer than 75 octets (the
+    continuation lines start with a space), terminating it with CRLF."""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+
+    lines, current, size = [], "", 0
+    for char in line:
+        char_size = len(char.encode())
+
+        # the continuation lines have one octet less, because of the leading space
+        if size + char_size > (75 if len(lines) == 0 else 74):
+            lines.append(current)
+            current, size = "", 0
+
+        current += char
+        size += char_size
+
+    lines.append(current)
+
+    return "\r\n ".join(lines) + "\r\n"
+
+
+def format_ics_date(value: date) -> str:
+    """Format the date (or datetime, as local time) for an iCalendar property (along
+    with the parameter of its type)."""
+    if isinstance(value, datetime):
+        return f"VALUE=DATE-TIME:{value.replace(tzinfo=None).strftime('%Y%m%dT%H%M%S')}"
+
+    return f"VALUE=DATE:{value.strftime('%Y%m%d')}"
+
+
+def get_first_monday() -> date:
+    """Return the monday of the first week of the semester (or of this week, if the
+    start of the semester isn't set in the configuration)."""
+    day = semester_start or date.today()
+    return date.fromordinal(day.toordinal() - day.weekday())
+
+
+def get_course_id(course) -> str:
+    """Return the part of the UIDs of the events that identifies the course (with its
+    semester, since the same course can be in more of them)."""
+    return f"{course.semester}-{course.code or course.abbreviation}-{course.type}" \
+        .replace(" ", "-")
+
+
+def get_event(
+    uid: str, stamp: str, summary: str, start: date, end: date = None, **properties
+) -> Iterator[str]:
+    """Yield the lines of a VEVENT (the other properties are already escaped)."""
+    yield "BEGIN:VEVENT"
+    yield f"UID:{uid}"
+    yield f"DTSTAMP:{stamp}"
+    yield f"DTSTART;{format_ics_date(start)}"
+
+    if end is not None:
+        yield f"DTEND;{format_ics_date(end)}"
+
+    yield f"SUMMARY:{escape_ics(summary)}"
+
+    for name, value in properties.items():
+        if value is not None:
+            yield f"{name.upper()}:{value}"
+
+    yield "END:VEVENT"
+
+
+def get_course_events(course, stamp: str) -> Iterator[str]:
+    """Yield the lines of the VEVENTs of the course: its (weekly repeating) times and
+    its finals."""
+    course_id = get_course_id(course)
+    summary = f"{course.name} ({course.type})"
+    location = None if course.classroom is None else escape_ics(course.classroom.number)
+
+    monday = get_first_monday()
+
+    for i, slot in enumerate(course.slots()):
+        first = monday + timedelta(days=slot.weekday())
+        rrule = "FREQ=WEEKLY"
+
+        # the odd/even weeks (and the end of the semester) are only known if the start
+        # of the semester is
+        if semester_start is not None:
+            weeks = range(semester_weeks)
+
+            if slot.weeks in ("odd", "even"):
+                weeks = weeks[0 if slot.weeks == "odd" else 1:: 2]
+                rrule += ";INTERVAL=2"
+
+            # the semester might not start on a monday
+            if len(weeks) != 0 and first + timedelta(weeks=weeks[0]) < semester_start:
+                weeks = weeks[1:]
+
+            # the course isn't in any of the weeks of the semester
+            if len(weeks) == 0:
+                continue
+
+            first += timedelta(weeks=weeks[0])
+            rrule += f";COUNT={len(weeks)}"
+
+        midnight = datetime.combine(first, datetime.min.time())
+
+        yield from get_event(
+            f"{course_id}-{i}@school",
+            stamp,
+            summary,
+            midnight + timedelta(minutes=slot.start),
+            midnight + timedelta(minutes=slot.end),
+            rrule=rrule,
+            location=location,
+        )
+
+    if course.finals is not None:
+        yield from get_event(
+            f"{course_id}-finals@school",
+            stamp,
+            f"Finals: {summary}",
+            course.finals.date,
+            location=escape_ics(course.finals.classroom.number),
+        )
+
+
+def get_homework_event(homework, stamp: str) -> Iterator[str]:
+    """Yield the lines of the VEVENT of the homework deadline (if it has one)."""
+    if not isinstance(homework.deadline, date):
+        return
+
+    course = homework.course
+
+    yield from get_event(
+        f"homework-{get_course_id(course)}-{homework.uid}@school",
+        stamp,
+        f"{homework.name or homework.uid} ({course.abbreviation})",
+        homework.deadline,
+        description=None if not homework.description else escape_ics(homework.description),
+        status="COMPLETED" if homework.completed else None,
+    )
+
+
+def get_ics(courses, homeworks) -> Iterator[str]:
+    """Yield the (folded) lines of the iCalendar of the courses and the homeworks."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def lines() -> Iterator[str]:
+        yield "BEGIN:VCALENDAR"
+        yield "VERSION:2.0"
+        yield "PRODID:-//school//export//EN"
+
+        for course in courses.get_sorted_courses(include_unscheduled=True):
+            yield from get_course_events(course, stamp)
+
+        for homework in homeworks.iterate_homeworks():
+            yield from get_homework_event(homework, stamp)
+
+        yield "END:VCALENDAR"
+
+    for line in lines():
+        yield fold_ics(line)
+
+
+def get_ics_fingerprint(courses) -> str:
+    """Return a fingerprint of everything the exported iCalendar depends on: the course
+    and homework files (their modification times and sizes) and the configuration."""
+    fingerprint = hashlib.blake2b(
+        repr((ICS_VERSION, semester_start, semester_weeks, get_first_monday())).encode()
+    )
+
+    # loads the courses, if they weren't already
+    courses.snapshot
+
+    for root, paths in courses.paths.items():
+        index = courses.indexes[root]
+
+        for path in paths:
+            fingerprint.update(f"{path}\0{index.files[path][:2]}\n".encode())
+
+    for course in courses.get_sorted_courses(include_unscheduled=True):
+        if not course_types[course.type].has_homework:
+            continue
+
+        try:
+            with os.scandir(os.path.join(course.path(), HW_FOLDER)) as entries:
+                stats = sorted(
+                    (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                    for e in entries
+                    if e.is_file()
+                )
+
+        except OSError:
+            continue
+
+        fingerprint.update(repr((course.path(), stats)).encode())
+
+    # the homework databases (if the homework is stored in them)
+    for root in courses.roots:
+        try:
+            stat = os.stat(os.path.join(root, homework_database))
+            fingerprint.update(f"{root}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+        except OSError:
+            pass
+
+    return fingerprint.hexdigest()
+
+
+def export_ics(courses, homeworks, cwd: str, option: str = "", **kwargs):
+    """Export the courses (their times and finals) and the homework deadlines as an
+    iCalendar to the file (or to the standard output, if it is '' or '-'). The exported
+    calendar is cached until any of the files it depends on change."""
+    import shutil
+    import tempfile
+
+    cache = os.path.join(courses.roots[0], cache_folder, "export.ics")
+    fingerprint = get_ics_fingerprint(courses)
+
+    try:
+        with open(cache + ".key") as f:
+            cached = f.read() == fingerprint
+    except OSError:
+        cached = False
+
+    output = (
+        sys.stdout
+        if option in ("", "-")
+        else open(os.path.join(cwd, option), "w", newline="")
+    )
+
+    # the calendar is written to the cache as it is generated (if the cache can be
+    # written to, that is)
+    tmp_path, cache_file = None, None
+    if not cached:
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache))
+            cache_file = os.fdopen(fd, "w", newline="")
+        except OSError:
+            pass
+
+    try:
+        if cached:
+            with open(cache, newline="") as f:
+                shutil.copyfileobj(f, output)
+        else:
+            for line in get_ics(courses, homeworks):
+                output.write(line)
+
+                if cache_file is not None:
+                    cache_file.write(line)
+
+            if cache_file is not None:
+                cache_file.close()
+                os.replace(tmp_path, cache)
+                atomic_write(cache + ".key", fingerprint)
+    finally:
+        if cache_file is not None and not cache_file.closed:
+            cache_file.close()
+            os.remove(tmp_path)
+
+        if output is not sys.stdout:
+            output.close()
@@ -1,22 +1,49 @@
 """A module for handling homework."""
+from collections import Counter
 from datetime import date, datetime, timedelta
-from random import choice
 from string import ascii_lowercase
 from subprocess import call
 
 from course import Course, Courses
+from database import HomeworkDatabase, from_deadline, to_deadline
 from utilities import *
 
 HW_FOLDER = ".homework"
 
+# the UIDs that YAML wouldn't read as strings (so they can't be used)
+RESERVED_UIDS = {"yes", "no", "on", "off", "true", "false", "null"}
 
-@dataclass
-class Homework(Strict):
-    # these three are not in the YAML itself, but instead from variables when created
-    # -------------------------------------------------------------------------------
-    # path: str
-    # course: Course
+# the maximum fraction of the UIDs of a given size that can be taken before the newly
+# generated UIDs get longer
+UID_OCCUPANCY = 0.5
+
+
+def get_deadline(homework) -> datetime:
+    """Return the deadline of the homework as a naive datetime (the dates being their
+    midnights), so that the deadlines of all homeworks can be compared."""
+    deadline = homework.deadline
+
+    if not isinstance(deadline, datetime):
+        return datetime.combine(deadline, datetime.min.time())
+
+    return deadline.replace(tzinfo=None)
 
+
+def parse_until(until: str) -> datetime:
+    """Parse the date of the --until option (a date without time being the whole day,
+    i.e. until the midnight that ends it)."""
+    try:
+        if len(until.strip()) == 10:
+            return datetime.combine(date.fromisoformat(until.strip()), datetime.min.time()) \
+                + timedelta(days=1)
+
+        return datetime.fromisoformat(until.strip())
+    except ValueError:
+        exit_with_error(f"Invalid date '{until}' (expected YYYY-MM-DD[ HH:MM]).")
+
+
+@dataclass(slots=True)
+class Homework(Strict):
     uid: str  # a course UID to identify it (for editing it)
     completed: bool
 
@@ -24,11 +51,15 @@ class Homework(Strict):
     description: str = None
     deadline: Union[date, str] = None  # str for special stuff like 'next course'
 
+    # these are not in the YAML itself, but instead from variables when created
+    path: str = derived()
+    course: Course = derived()
+
     @classmethod
-    def from_file(cls, path: str, course: Course):
-        """Initialize a Homework object from the path to its .yaml dictionary. Must be
-        created this way."""
-        hw = Homework._from_file(path)
+    def from_file(cls, path: str, course: Course, dictionary: Dict = None):
+        """Initialize a Homework object from the path to its .yaml dictionary (possibly
+        using its already parsed dictionary). Must be created this way."""
+        hw = Homework._from_file(path, dictionary)
 
         # additional attributes that it is good for homework objects to have
         hw.path = path
@@ -37,10 +68,63 @@ class Homework(Strict):
         return hw
 
     @classmethod
-    def get_uid(cls):
-        """Generate a homework UID. Size 2 gives 26^2 = 676. That should be more than
-        enough individual homework assignments for a semester. I hope."""
-        return "".join([choice(ascii_lowercase) for _ in range(2)])
+    def from_row(cls, row: Tuple, course: Course):
+        """Initialize a Homework object from its row in the homework database (the rows
+        were checked when they were added, so their types are not checked again)."""
+        uid, _, file, completed, name, description, deadline, _ = row
+
+        hw = Homework.from_dictionary(
+            {
+                "uid": uid,
+                "completed": bool(completed),
+                "name": name,
+                "description": description,
+                "deadline": to_deadline(deadline),
+            },
+            validate=False,
+        )
+
+        # the path where the file of the homework would be (see 'homework export')
+        hw.path = os.path.join(course.path(), HW_FOLDER, file)
+        hw.course = course
+
+        return hw
+
+    def to_row(self, course_key: str, source: str) -> Tuple:
+        """Return the row of the homework database for the homework (with the given
+        YAML source, the course key being the path of the course in its folder)."""
+        return (
+            self.uid,
+            course_key,
+            os.path.basename(self.path),
+            int(self.completed),
+            self.name,
+            self.description,
+            from_deadline(self.deadline),
+            source,
+        )
+
+    def to_dictionary(self) -> Dict:
+        return {**Strict.to_dictionary(self), "course": self.course.reference()}
+
+    @classmethod
+    def get_uid(cls, taken: Set[str]) -> str:
+        """Generate a homework UID that isn't taken. Size 2 gives 26^2 = 676, which is
+        enough for a semester, but not for an archive of them -- when too many UIDs of
+        the current size are taken, the size grows, so a free one is quick to find."""
+        from random import choice
+
+        lengths = Counter(len(uid) for uid in taken)
+
+        size = 2
+        while lengths[size] >= UID_OCCUPANCY * len(ascii_lowercase) ** size:
+            size += 1
+
+        while True:
+            uid = "".join([choice(ascii_lowercase) for _ in range(size)])
+
+            if uid not in taken and uid not in RESERVED_UIDS:
+                return uid
 
 
 class Homeworks:
@@ -49,10 +133,156 @@ class Homeworks:
     def __init__(self, courses: Courses):
         self.courses = courses
 
+        # the homework databases of the courses folders (only used with the sqlite
+        # homework_backend, or when importing/exporting the homework)
+        self.databases = {root: HomeworkDatabase(root) for root in courses.roots}
+
     def _filter_by_homework(self, courses):
         """Filter out courses that can't have homework."""
         return [c for c in courses if course_types[c.type].has_homework]
 
+    def _get_root(self, course: Course) -> str:
+        """Return the courses folder of the course."""
+        return self.courses.get_index(course.path()).folder
+
+    def _get_course_key(self, course: Course) -> str:
+        """Return the key of the course in the homework database (its path, relative
+        to its courses folder)."""
+        return os.path.relpath(course.path(), self._get_root(course))
+
+    def _get_courses_by_key(self) -> Dict[Tuple[str, str], Course]:
+        """Return the courses that can have homework by their courses folder and key."""
+        return {
+            (self._get_root(course), self._get_course_key(course)): course
+            for course in self._filter_by_homework(
+                self.courses.get_sorted_courses(include_unscheduled=True)
+            )
+        }
+
+    def _from_rows(self, root: str, rows: Iterable[Tuple]) -> Iterator[Homework]:
+        """Create the homeworks from the rows of the database of the courses folder
+        (skipping the ones whose course no longer exists)."""
+        courses = self._get_courses_by_key()
+
+        for row in rows:
+            course = courses.get((root, row[1]))
+
+            if course is not None:
+                yield Homework.from_row(row, course)
+
+    def _get_homework_paths(self, course: Course) -> List[str]:
+        """Return the paths of the homework files of the course (they are stored in its
+        .homework folder)."""
+        try:
+            with os.scandir(os.path.join(course.path(), HW_FOLDER)) as entries:
+                return [entry.path for entry in entries if entry.is_file()]
+        except OSError:
+            return []
+
+    def _get_homework_dirs(self) -> Dict[str, Course]:
+        """Return the homework directories of all courses that can have homework."""
+        return {
+            os.path.join(course.path(), HW_FOLDER): course
+            for course in self._filter_by_homework(
+                self.courses.get_sorted_courses(include_unscheduled=True)
+            )
+        }
+
+    def get_uids(self) -> Set[str]:
+        """Return the UIDs of all homeworks (from the index)."""
+        if homework_backend == "sqlite":
+            return {uid for d in self.databases.values() for uid in d.get_uids()}
+
+        uids = set()
+        for directory in self._get_homework_dirs():
+            uids.update(self.courses.get_index(directory).get_uids(directory))
+
+        self.courses.save_indexes()
+
+        return uids
+
+    def get_indexed_uids(self) -> List[str]:
+        """Return the UIDs of the homeworks in the index, i.e. without parsing anything
+        (so they might be out of date). If the index has no UIDs yet (it is new or was
+        rebuilt), they are listed from the homework folders first."""
+        if homework_backend == "sqlite":
+            return sorted(
+                {uid for d in self.databases.values() if d.exists() for uid in d.get_uids()}
+            )
+
+        if all(len(index.uids) == 0 for index in self.courses.indexes.values()):
+            return sorted(self.get_uids())
+
+        # (the same UID might be in more courses folders)
+        return sorted(
+            {
+                uid
+                for index in self.courses.indexes.values()
+                for _, uids in index.uids.values()
+                for uid in uids
+            }
+        )
+
+    def get_homework(self, uid: str) -> Optional[Homework]:
+        """Return the homework with the specified UID (or None if there is none)."""
+        return self.get_homeworks_by_uid([uid]).get(uid)
+
+    def get_homeworks_by_uid(self, uids: Iterable[str]) -> Dict[str, Homework]:
+        """Return the homeworks with the specified UIDs (skipping those that don't
+        exist). Only the files of the homeworks are read, their paths are taken from
+        the index. A UID that is in more than one courses folder is an error (it isn't
+        clear which of the homeworks is meant)."""
+        homeworks: Dict[str, Homework] = {}
+        uids = set(uids)
+
+        if homework_backend == "sqlite":
+            for root, database in self.databases.items():
+                if len(uids) != 0 and database.exists():
+                    for homework in self._from_rows(root, database.get_by_uid(uids)):
+                        self._add_by_uid(homeworks, homework)
+
+            return homeworks
+
+        for directory, course in self._get_homework_dirs().items():
+            index = self.courses.get_index(directory)
+
+            for retry in (False, True):
+                indexed_uids = index.get_uids(directory)
+                changed = False
+
+                for uid in uids & indexed_uids.keys():
+                    homework = Homework.from_file(
+                        os.path.join(directory, indexed_uids[uid]), course
+                    )
+
+                    if homework.uid == uid:
+                        self._add_by_uid(homeworks, homework)
+                    else:
+                        changed = True
+
+                # the file was changed in place (which doesn't change the modification
+                # time of its directory), so the directory is indexed again
+                if not changed or retry:
+                    break
+
+                index.forget_uids(directory)
+
+        self.courses.save_indexes()
+
+        return homeworks
+
+    def _add_by_uid(self, homeworks: Dict[str, Homework], homework: Homework):
+        """Add the homework to the homeworks by its UID, exiting with an error if there
+        is a homework with the same UID in another courses folder."""
+        other = homeworks.setdefault(homework.uid, homework)
+
+        roots = [self._get_root(h.course) for h in (other, homework)]
+        if roots[0] != roots[1]:
+            exit_with_error(
+                f"Homework UID '{homework.uid}' is ambiguous, it is in multiple courses"
+                f" folders ({', '.join(sorted(roots))})."
+            )
+
     def get_homeworks(self, option: str = "", completed=False, undeadlined=True):
         """Get all homework( object)s, sorted by their due date. If option is specified,
         only get homework from specified courses."""
@@ -65,26 +295,148 @@ class Homeworks:
             else self._filter_by_homework(self.courses.get_course_from_argument(option))
         )
 
-        for course in courses:
-            # they are stored in a .homework file of each course
-            hw_base_path = os.path.join(course.path(), HW_FOLDER)
+        if homework_backend == "sqlite":
+            return self._query_homeworks(
+                None if option == "" else courses, completed, undeadlined
+            )
+
+        with timed("list homeworks"):
+            if self.courses.parallel:
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(parallel_threads) as executor:
+                    hw_paths = list(executor.map(self._get_homework_paths, courses))
+            else:
+                hw_paths = [self._get_homework_paths(course) for course in courses]
+
+        # the files of all courses are parsed in one batch
+        pairs = [(path, c) for c, paths in zip(courses, hw_paths) for path in paths]
+        dictionaries = self.courses.parse([path for path, _ in pairs])
 
-            if os.path.exists(hw_base_path):
-                for path in os.listdir(hw_base_path):
-                    hw_path = os.path.join(hw_base_path, path)
+        with timed("create homeworks"):
+            for (hw_path, course), dictionary in zip(pairs, dictionaries):
+                hw = Homework.from_file(hw_path, course, dictionary)
 
-                    if os.path.isfile(hw_path):
-                        hw = Homework.from_file(hw_path, course)
+                # add all, or only the completed ones if specified
+                if not hw.completed or completed:
+                    homeworks.append(hw)
 
-                        # add all, or only the completed ones if specified
-                        if not hw.completed or completed:
-                            homeworks.append(hw)
+        count("homeworks created", len(pairs))
 
         return sorted(
             filter(lambda h: h.deadline is not None or undeadlined, homeworks),
             key=lambda h: h.deadline or datetime.max,
         )
 
+    def _get_course_keys(
+        self, courses: Optional[List[Course]]
+    ) -> Dict[str, Optional[List[str]]]:
+        """Return the keys of the courses in the homework databases by their courses
+        folders (for courses None, each folder gets None, i.e. all of its courses)."""
+        if courses is None:
+            return {root: None for root in self.databases}
+
+        keys: Dict[str, Optional[List[str]]] = {}
+        for course in courses:
+            keys.setdefault(self._get_root(course), []).append(self._get_course_key(course))
+
+        return keys
+
+    def _query_homeworks(
+        self, courses: Optional[List[Course]], completed: bool, undeadlined: bool
+    ) -> List[Homework]:
+        """Get the homework of the courses (or of all of them, if None) from the
+        homework databases, sorted by their due date."""
+        from heapq import merge
+
+        keys = self._get_course_keys(courses)
+
+        # the homework of each of the courses folders is already sorted
+        return list(
+            merge(
+                *(
+                    self._from_rows(
+                        root, self.databases[root].get(k, completed, undeadlined)
+                    )
+                    for root, k in keys.items()
+                ),
+                key=lambda h: h.deadline or datetime.max,
+            )
+        )
+
+    def get_upcoming(
+        self,
+        option: str = "",
+        limit: int = None,
+        until: datetime = None,
+        completed: bool = False,
+    ) -> List[Homework]:
+        """Get the first limit homeworks (of the courses specified by option, or of all
+        of them) with a deadline before until (either can be None), sorted by their due
+        date. Only the selected homeworks are kept, not all of them."""
+        from heapq import merge, nsmallest
+        from itertools import islice
+
+        courses = self._filter_by_homework(
+            self.courses.get_sorted_courses(include_unscheduled=True)
+            if option == ""
+            else self.courses.get_course_from_argument(option)
+        )
+
+        if homework_backend == "sqlite":
+            keys = self._get_course_keys(None if option == "" else courses)
+
+            # the homeworks of each of the courses folders are sorted (and limited)
+            # by the database, so merging their first ones is enough
+            homeworks = merge(
+                *(
+                    self._from_rows(
+                        root,
+                        self.databases[root].get(k, completed, False, limit, until),
+                    )
+                    for root, k in keys.items()
+                ),
+                key=get_deadline,
+            )
+
+            return list(islice(homeworks, limit))
+
+        # the homeworks have to be read anyway (their deadlines are in their files), but
+        # they are streamed course by course, so only the selected ones are kept
+        homeworks = (
+            homework
+            for course in courses
+            for homework in self._iterate_course_homeworks(course)
+            if (completed or not homework.completed)
+            and isinstance(homework.deadline, date)
+            and (until is None or get_deadline(homework) < until)
+        )
+
+        if limit is not None:
+            return nsmallest(limit, homeworks, key=get_deadline)
+
+        return sorted(homeworks, key=get_deadline)
+
+    def _iterate_course_homeworks(self, course: Course) -> Iterator[Homework]:
+        """Iterate over the homeworks of the course (in the order of their files)."""
+        paths = sorted(self._get_homework_paths(course))
+
+        for path, dictionary in zip(paths, self.courses.parse(paths)):
+            yield Homework.from_file(path, course, dictionary)
+
+    def iterate_homeworks(self) -> Iterator[Homework]:
+        """Iterate over all homeworks (including the completed ones), course by course
+        (so only the homeworks of one course are in memory at a time)."""
+        if homework_backend == "sqlite":
+            for root, database in self.databases.items():
+                yield from self._from_rows(root, database.get_all())
+            return
+
+        for course in self._filter_by_homework(
+            self.courses.get_sorted_courses(include_unscheduled=True)
+        ):
+            yield from self._iterate_course_homeworks(course)
+
     def extrapolate(self, course: str = "", **kwargs):
         """Take the last two homeworks from a given course and attempt to extrapolate
         the next one."""
@@ -107,15 +459,35 @@ class Homeworks:
         except Exception as e:
             exit_with_error("Couldn't extrapolate.")
 
-    def list(self, option: str = "", short: bool = False, **kwargs):
+    def list(
+        self,
+        option: str = "",
+        short: bool = False,
+        format="table",
+        limit: int = None,
+        until: str = None,
+        **kwargs,
+    ):
         # build a table
         table = [["Homework"]]
 
-        homeworks = (
-            self.get_homeworks(option)
-            if option != "all"
-            else self.get_homeworks(completed=True, undeadlined=True)
-        )
+        if limit is not None or until is not None:
+            homeworks = self.get_upcoming(
+                option if option != "all" else "",
+                limit,
+                None if until is None else parse_until(until),
+                completed=option == "all",
+            )
+        else:
+            homeworks = (
+                self.get_homeworks(option)
+                if option != "all"
+                else self.get_homeworks(completed=True, undeadlined=True)
+            )
+
+        if format != "table":
+            print_records((homework.to_dictionary() for homework in homeworks), format)
+            return
 
         saw_undeadlined = False
         for homework in homeworks:
@@ -126,7 +498,7 @@ class Homeworks:
                     saw_undeadlined = True
                 due_msg = "-"
             else:
-                delta = homework.deadline.replace(tzinfo=None) - datetime.now()
+                delta = get_deadline(homework) - datetime.now()
                 due_msg = due_message_from_timedelta(delta)
 
                 # custom due message for overdue/completed homework
@@ -148,6 +520,10 @@ class Homeworks:
                 due_msg,
             ]
 
+            # the homeworks of multiple semesters are told apart by their semester
+            if len(self.courses.roots) > 1:
+                row.insert(1, homework.course.semester)
+
             table.append(row)
 
         # if no homework is added, be happy
@@ -163,13 +539,40 @@ class Homeworks:
             """Opens the specified website in a web browser."""
             call(text_editor + [path])
 
-        for homework in self.get_homeworks(completed=True, undeadlined=True):
-            if homework.uid == uid:
-                open_in_text_editor(homework.path)
-                self.list("")
-                return
+        homework = self.get_homework(uid)
+
+        if homework is None:
+            exit_with_error(f"No homework with UID '{uid}' found.")
+
+        if homework_backend == "sqlite":
+            self._edit_row(homework, open_in_text_editor)
+        else:
+            open_in_text_editor(homework.path)
+
+        self.list("")
+
+    def _edit_row(self, homework: Homework, open_in_text_editor: Callable):
+        """Edit the source of the homework in the database (in a temporary file, which
+        is left behind if the edited homework is invalid, so no changes are lost)."""
+        import tempfile
 
-        exit_with_error(f"No homework with UID '{uid}' found.")
+        database = self.databases[self._get_root(homework.course)]
+        (row,) = database.get_by_uid([homework.uid])
+
+        fd, path = tempfile.mkstemp(prefix=f"{homework.uid}.", suffix=".yaml")
+        with os.fdopen(fd, "w") as f:
+            f.write(row[-1])
+
+        open_in_text_editor(path)
+
+        with open(path, newline="") as f:
+            source = f.read()
+
+        edited = Homework.from_file(path, homework.course, load_yaml_files([path])[0])
+        edited.path = homework.path
+
+        database.replace(homework.uid, edited.to_row(row[1], source))
+        os.remove(path)
 
     def add(self, option: str, name=None, date=None, **kwargs):
         """Add a new homework."""
@@ -186,91 +589,274 @@ class Homeworks:
         path = course.path()
         hw_dir = os.path.join(path, HW_FOLDER)
 
-        # create the homework folder, if it doesn't exist
-        if not os.path.exists(hw_dir):
-            os.mkdir(hw_dir)
-
         # generate a unique UID
-        homeworks = self.get_homeworks(completed=True, undeadlined=True)
-        while True:
-            uid = Homework.get_uid()
-
-            for homework in homeworks:
-                if homework.uid == uid:
-                    break
-            else:
-                break
-
-        with open(os.path.join(hw_dir, f"{uid}.yaml"), "w") as f:
-            if course.time is not None:
-                # TODO: odd / even weeks are counted from semester start
-                next_time = datetime.now().replace(
-                    hour=course.time.start // 60,
-                    minute=course.time.start % 60,
-                    second=0
-                )
+        uid = Homework.get_uid(self.get_uids())
+
+        if course.time is not None:
+            # TODO: odd / even weeks are counted from semester start
+            next_time = datetime.now().replace(
+                hour=course.time.start // 60,
+                minute=course.time.start % 60,
+                second=0
+            )
+            next_time += timedelta(days=1)
+            while next_time.weekday() != course.weekday():
                 next_time += timedelta(days=1)
-                while next_time.weekday() != course.weekday():
-                    next_time += timedelta(days=1)
-            else:
-                next_time = datetime.now().replace(second=0)
-            f.write(
-                f"uid: {uid}\n"
-                f"name: {name or ''}\n"
-                f"description: \n"
-                f"deadline: {date or next_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"\n"
-                f"completed: False\n"
+        else:
+            next_time = datetime.now().replace(second=0)
+
+        source = (
+            f"uid: {uid}\n"
+            f"name: {name or ''}\n"
+            f"description: \n"
+            f"deadline: {date or next_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"\n"
+            f"completed: False\n"
+        )
+
+        if homework_backend == "sqlite":
+            import yaml
+
+            hw_path = os.path.join(hw_dir, f"{uid}.yaml")
+            homework = Homework.from_file(hw_path, course, yaml.safe_load(source))
+
+            self.databases[self._get_root(course)].put(
+                [homework.to_row(self._get_course_key(course), source)]
             )
+        else:
+            # create the homework folder, if it doesn't exist
+            if not os.path.exists(hw_dir):
+                os.mkdir(hw_dir)
+
+            with open(os.path.join(hw_dir, f"{uid}.yaml"), "w") as f:
+                f.write(source)
+
+            self.courses.get_index(hw_dir).set_uid(hw_dir, uid, f"{uid}.yaml")
+            self.courses.save_indexes()
 
         self.edit(uid)
 
     def delete(self, uid: str, **kwargs):
         """Delete a homework with the specified UID."""
-        for homework in self.get_homeworks(completed=True, undeadlined=True):
-            if homework.uid == uid:
-                os.remove(homework.path)
-                self.list("")
-                exit_with_success(f"Homework '{uid}' deleted.")
-
-        exit_with_error(f"No homework with UID '{uid}' found.")
-
-    def complete(self, uid: str, **kwargs):
-        """Mark a homework with the specified UID as complete. Although using sed is
-        likely more prone to breakage, I don't want Pyyaml messing with my formatting,
-        so it's going to stay this way."""
-        for homework in self.get_homeworks(completed=True, undeadlined=True):
-            if homework.uid == uid:
-                call(
-                    [
-                        "sed",
-                        "-i",
-                        r"s/^\s*completed\s*:\s*False\s*/completed: True/",
-                        homework.path,
-                    ]
+        homework = self.get_homework(uid)
+
+        if homework is None:
+            exit_with_error(f"No homework with UID '{uid}' found.")
+
+        if homework_backend == "sqlite":
+            self.databases[self._get_root(homework.course)].delete(uid)
+        else:
+            os.remove(homework.path)
+
+            hw_dir = os.path.dirname(homework.path)
+            self.courses.get_index(hw_dir).set_uid(hw_dir, uid, None)
+            self.courses.save_indexes()
+
+        self.list("")
+        print_success(f"Homework '{uid}' deleted.")
+
+    def _set_completed(self, uids: Tuple[str], completed: bool):
+        """Mark the homeworks with the specified UIDs as complete/incomplete. Although
+        editing the files by hand is likely more prone to breakage, I don't want Pyyaml
+        messing with my formatting, so it's going to stay this way."""
+        if len(uids) == 0:
+            exit_with_error("No homework UIDs specified.")
+
+        homeworks = self.get_homeworks_by_uid(uids)
+
+        for uid in uids:
+            if uid not in homeworks:
+                exit_with_error(f"No homework with UID '{uid}' found.")
+
+        # YAML reads 'false' and 'FALSE' as False too (and the same goes for True)
+        pattern = re.compile(
+            rf"^([ \t]*)completed[ \t]*:[ \t]*(?i:{not completed})[ \t]*$", re.M
+        )
+
+        # the new contents are found first, so nothing is written if any of them fails
+        sources: Dict[str, Tuple[Optional[Tuple], str]] = {}
+        for uid, homework in homeworks.items():
+            if homework.completed == completed:
+                continue
+
+            if homework_backend == "sqlite":
+                database = self.databases[self._get_root(homework.course)]
+                (row,) = database.get_by_uid([uid])
+                source = row[-1]
+            else:
+                row = None
+                with open(homework.path, "r") as f:
+                    source = f.read()
+
+            source, n = pattern.subn(rf"\1completed: {completed}", source)
+
+            # the value is written in some other way (like 'completed: no')
+            if n == 0:
+                exit_with_error(
+                    f"Can't find 'completed: {not completed}' in homework '{uid}',"
+                    " nothing was changed.",
+                    homework.path,
                 )
 
-                self.list("")
-                exit_with_success(f"Homework '{uid}' marked as complete.")
-
-        exit_with_error(f"No homework with UID '{uid}' found.")
-
-    def incomplete(self, uid: str, **kwargs):
-        """Mark a homework with the specified UID as incomplete. Although using sed is
-        likely more prone to breakage, I don't want Pyyaml messing with my formatting,
-        so it's going to stay this way."""
-        for homework in self.get_homeworks(completed=True, undeadlined=True):
-            if homework.uid == uid:
-                call(
-                    [
-                        "sed",
-                        "-i",
-                        r"s/^\s*completed\s*:\s*True\s*/completed: False/",
-                        homework.path,
-                    ]
+            sources[uid] = (row, source)
+
+        for uid, (row, source) in sources.items():
+            homework = homeworks[uid]
+
+            if homework_backend == "sqlite":
+                homework.completed = completed
+                self.databases[self._get_root(homework.course)].replace(
+                    uid, homework.to_row(row[1], source)
+                )
+                continue
+
+            atomic_write(homework.path, source)
+
+            # the file was replaced, which changes the directory's modification time
+            hw_dir = os.path.dirname(homework.path)
+            self.courses.get_index(hw_dir).set_uid(
+                hw_dir, uid, os.path.basename(homework.path)
+            )
+
+        self.courses.save_indexes()
+
+        self.list("")
+        print_success(
+            f"Homework{'s' if len(uids) > 1 else ''} "
+            f"{', '.join(repr(uid) for uid in uids)} "
+            f"marked as {'complete' if completed else 'incomplete'}."
+        )
+
+    def import_files(self, **kwargs):
+        """Import the homework files (of all of the courses) to the homework databases,
+        replacing the homework with the same UIDs."""
+        rows: Dict[str, List[Tuple]] = {root: [] for root in self.databases}
+
+        courses = self._filter_by_homework(
+            self.courses.get_sorted_courses(include_unscheduled=True)
+        )
+
+        for course in courses:
+            paths = sorted(self._get_homework_paths(course))
+
+            for path, dictionary in zip(paths, self.courses.parse(paths)):
+                # read as-is (without translating the newlines), so the export is exact
+                with open(path, newline="") as f:
+                    source = f.read()
+
+                homework = Homework.from_file(path, course, dictionary)
+                rows[self._get_root(course)].append(
+                    homework.to_row(self._get_course_key(course), source)
                 )
 
-                self.list("")
-                exit_with_success(f"Homework '{uid}' marked as incomplete.")
+        # the rows are keyed by the UIDs, so a duplicate one would silently replace
+        # the other homework (whose file a later 'export prune' would then delete)
+        duplicates = [
+            [row[0], os.path.join(root, row[1], HW_FOLDER, row[2])]
+            for root, root_rows in rows.items()
+            for uids in [Counter(row[0] for row in root_rows)]
+            for row in root_rows
+            if uids[row[0]] > 1
+        ]
+
+        if len(duplicates) != 0:
+            print_table([["Duplicate UIDs"]] + sorted(duplicates))
+            exit_with_error("Some homeworks have the same UIDs, nothing was imported.")
+
+        for root, database in self.databases.items():
+            database.put(rows[root])
+
+        print_success(
+            f"{sum(len(r) for r in rows.values())} homeworks imported to the homework"
+            f" database{'s' if len(rows) > 1 else ''}."
+            + (
+                " Set homework_backend to 'sqlite' in config.py to use it."
+                if homework_backend != "sqlite"
+                else ""
+            )
+        )
+
+    def export_files(self, option: str = "", **kwargs):
+        """Export the homework from the homework databases to the homework files (only
+        the files whose contents differ are written). The homework files that are not
+        in the databases (i.e. were deleted from them) would come back under the YAML
+        backend, so the export refuses to run if there are any, unless the option is
+        'prune', in which case they are deleted."""
+        if option not in ("", "prune"):
+            exit_with_error("Invalid export option!")
+
+        courses = self._get_courses_by_key()
+
+        # the paths of the exported files and their contents
+        files: Dict[str, str] = {}
+        skipped = 0
+
+        for root, database in self.databases.items():
+            if not database.exists():
+                continue
+
+            for row in database.get_all():
+                course = courses.get((root, row[1]))
+
+                # the course was removed (or can no longer have homework)
+                if course is None:
+                    skipped += 1
+                    continue
+
+                files[os.path.join(course.path(), HW_FOLDER, row[2])] = row[-1]
+
+        # the homework files that the export would leave behind
+        stale = [
+            (course, path)
+            for (root, _), course in courses.items()
+            if self.databases[root].exists()
+            for path in sorted(self._get_homework_paths(course))
+            if path not in files
+        ]
+
+        if len(stale) != 0 and option != "prune":
+            print_table(
+                [["Not in the database"]]
+                + [
+                    [course.abbreviation, course.type, os.path.basename(path)]
+                    for course, path in stale
+                ]
+            )
+            exit_with_error(
+                "Some homework files are not in the database (they were deleted from it"
+                " or added to the files after the import); nothing was exported. Use"
+                " 'homework export prune' to delete them, or 'homework import' first."
+            )
+
+        written, unchanged = 0, 0
+
+        for path, source in files.items():
+            try:
+                with open(path, newline="") as f:
+                    if f.read() == source:
+                        unchanged += 1
+                        continue
+            except OSError:
+                pass
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, source)
+            written += 1
+
+        for _, path in stale:
+            os.remove(path)
+
+        print_success(
+            f"{written} homework files written ({unchanged} unchanged"
+            + (f", {len(stale)} deleted" if stale else "")
+            + (f", {skipped} of removed courses skipped" if skipped else "")
+            + ")."
+        )
+
+    def complete(self, *uids: str, **kwargs):
+        """Mark the homeworks with the specified UIDs as complete."""
+        self._set_completed(uids, True)
 
-        exit_with_error(f"No homework with UID '{uid}' found.")
+    def incomplete(self, *uids: str, **kwargs):
+        """Mark the homeworks with the specified UIDs as incomplete."""
+        self._set_completed(uids, False)
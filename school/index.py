@@ -0,0 +1,298 @@
+"""A module for caching the parsed files of the courses folder on disk."""
+import pickle
+
+from utilities import *
+
+
+class Index:
+    """A persistent index of the parsed YAML files in the courses folder. The files
+    are keyed by their path and are only parsed again when their modification time or
+    size changes. Directories are keyed the same way (by their modification time), so
+    that they are only listed again when a file is added to/removed from them."""
+
+    # bump when the format of the pickled index changes
+    VERSION = 3
+
+    def __init__(self, folder: str, parallel: bool = False):
+        """Create the index of the folder. If parallel is True, the directories are
+        listed concurrently and the files are parsed in a process pool."""
+        self.folder = folder
+        self.parallel = parallel
+        self.path = os.path.join(folder, cache_folder, "index.pickle")
+
+        # path -> (mtime, size, parsed dictionary, whether its types were checked)
+        self.files: Dict[str, Tuple[int, int, Dict, bool]] = {}
+
+        # path -> (mtime, subdirectory names, course YAML names)
+        self.dirs: Dict[str, Tuple[int, List[str], List[str]]] = {}
+
+        # homework directory path -> (mtime, {homework UID: homework file name})
+        self.uids: Dict[str, Tuple[int, Dict[str, str]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.changed = False
+
+        self.load()
+
+    def load(self):
+        """Load the index from the disk (if it exists and is of the current version)."""
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+
+            if data[0] != self.VERSION:
+                self.clear()
+            else:
+                _, self.files, self.dirs, self.uids = data
+        except FileNotFoundError:
+            # a missing index is empty, but there is nothing to replace on the disk
+            self.clear()
+            self.changed = False
+        except Exception:
+            # a corrupted index is the same as an empty one
+            self.clear()
+
+    def save(self):
+        """Atomically save the index to the disk, if anything changed since loading.
+        The cache folder isn't created if the courses folder doesn't exist (it might be
+        a typo) or if there is nothing in the index."""
+        if not self.changed or not os.path.isdir(self.folder):
+            return
+
+        if len(self.files) == 0 and len(self.uids) == 0 and not os.path.exists(self.path):
+            return
+
+        import tempfile
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((self.VERSION, self.files, self.dirs, self.uids), f)
+
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        except OSError:
+            # the courses folder might be read-only (an archived semester, for example)
+            # in which case the index is simply not persisted
+            pass
+
+    def clear(self):
+        """Clear the contents of the index."""
+        self.files, self.dirs, self.uids = {}, {}, {}
+        self.changed = True
+
+    def _list(self, directory: str) -> Optional[Tuple[int, List[str], List[str]]]:
+        """Return the (mtime, subdirectory names, course YAML names) of the directory,
+        listing it only if it changed since it was last indexed (None if it doesn't
+        exist)."""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self.dirs.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached
+
+        # if course_yaml is a hidden file, also search for non-hidden variants
+        # (for backwards compatibility)
+        is_course_yaml = lambda f: f == course_yaml \
+                or (course_yaml[0] == "." and f == course_yaml[1:])
+
+        subdirectories, filenames = [], []
+
+        # scandir knows the types of the entries without stat-ing each of them
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                # skip hidden directories
+                if entry.is_dir():
+                    if not entry.name[0] == '.':
+                        subdirectories.append(entry.name)
+                elif is_course_yaml(entry.name):
+                    filenames.append(entry.name)
+
+        return mtime, subdirectories, filenames
+
+    def _list_all(self) -> Dict[str, Tuple[int, List[str], List[str]]]:
+        """List all of the directories in the folder (concurrently, if parallel)."""
+        dirs = {}
+
+        if not self.parallel:
+            stack = [self.folder]
+            while len(stack) != 0:
+                directory = stack.pop()
+
+                listing = self._list(directory)
+                if listing is not None:
+                    dirs[directory] = listing
+                    stack += [os.path.join(directory, d) for d in listing[1]]
+
+            return dirs
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        # the subdirectories are submitted as soon as their parent is listed, so the
+        # listing (mostly waiting for the file system) is spread across the threads
+        with ThreadPoolExecutor(parallel_threads) as executor:
+            pending = {executor.submit(self._list, self.folder): self.folder}
+
+            while len(pending) != 0:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    directory = pending.pop(future)
+
+                    listing = future.result()
+                    if listing is not None:
+                        dirs[directory] = listing
+
+                        for d in listing[1]:
+                            path = os.path.join(directory, d)
+                            pending[executor.submit(self._list, path)] = path
+
+        return dirs
+
+    def walk(self) -> List[str]:
+        """Return the paths of all course YAML files in the courses folder (in a stable
+        order). Only the directories that changed since the last walk are listed again."""
+        dirs = self._list_all()
+
+        # the directories that were listed again (or no longer exist) change the index
+        if len(dirs) != len(self.dirs) \
+                or any(self.dirs.get(d) is not listing for d, listing in dirs.items()):
+            self.changed = True
+        self.dirs = dirs
+
+        paths = []
+
+        stack = [self.folder]
+        while len(stack) != 0:
+            directory = stack.pop()
+
+            if directory in dirs:
+                _, subdirectories, filenames = dirs[directory]
+
+                paths += [os.path.join(directory, f) for f in filenames]
+                stack += [os.path.join(directory, d) for d in reversed(subdirectories)]
+
+        return paths
+
+    def get(self, path: str) -> Tuple[Dict, bool]:
+        """Return the parsed dictionary of the YAML file (parsing it only if it changed
+        since it was last indexed) and whether its types were already checked (see
+        set_validated)."""
+        return self.get_all([path])[0]
+
+    def get_all(self, paths: List[str]) -> List[Tuple[Dict, bool]]:
+        """Like get, but for a batch of files (the changed ones are parsed together)."""
+        results: List[Optional[Tuple[Dict, bool]]] = []
+        stats, missed = {}, []
+
+        for i, path in enumerate(paths):
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+
+            cached = self.files.get(path)
+            if cached is not None and cached[:2] == stats[path]:
+                self.hits += 1
+                results.append((cached[2], cached[3]))
+            else:
+                results.append(None)
+                missed.append(i)
+
+        count("files stat'ed", len(paths))
+        count("index hits", len(paths) - len(missed))
+        count("index misses", len(missed))
+
+        if len(missed) != 0:
+            dictionaries = self.parse([paths[i] for i in missed])
+
+            for i, dictionary in zip(missed, dictionaries):
+                self.files[paths[i]] = stats[paths[i]] + (dictionary, False)
+                results[i] = (dictionary, False)
+
+            self.misses += len(missed)
+            self.changed = True
+
+        return results
+
+    def set_validated(self, paths: Iterable[str]):
+        """Mark the files as having their types checked, so that they are trusted the
+        next time they are taken from the index (until they change)."""
+        for path in paths:
+            cached = self.files.get(path)
+
+            if cached is not None and not cached[3]:
+                self.files[path] = cached[:3] + (True,)
+                self.changed = True
+
+    def parse(self, paths: List[str]) -> List[Dict]:
+        """Parse the YAML files (in a process pool, if parallel)."""
+        return load_yaml_files(paths, processes=parallel_processes if self.parallel else 1)
+
+    def prune(self, paths: Iterable[str]):
+        """Drop the indexed files that are not in paths (i.e. were deleted)."""
+        paths = set(paths)
+
+        for path in list(self.files):
+            if path not in paths:
+                del self.files[path]
+                self.changed = True
+
+    def get_uids(self, directory: str) -> Dict[str, str]:
+        """Return the UIDs of the homeworks in the homework directory (mapped to the
+        names of their files), parsing the files only if the directory changed since
+        it was last indexed."""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            if self.uids.pop(directory, None) is not None:
+                self.changed = True
+            return {}
+
+        cached = self.uids.get(directory)
+        if cached is not None and cached[0] == mtime:
+            self.hits += 1
+            count("index hits")
+            return cached[1]
+
+        with os.scandir(directory) as entries:
+            names = sorted(entry.name for entry in entries if entry.is_file())
+
+        dictionaries = self.parse([os.path.join(directory, n) for n in names])
+        uids = {str(d.get("uid")): name for name, d in zip(names, dictionaries)}
+
+        self.misses += 1
+        count("index misses")
+        self.uids[directory] = (mtime, uids)
+        self.changed = True
+
+        return uids
+
+    def set_uid(self, directory: str, uid: str, name: Optional[str]):
+        """Update the UID of a homework that was added to (or, if name is None, removed
+        from) the homework directory."""
+        cached = self.uids.get(directory)
+
+        # if the directory wasn't indexed, index it whole (including the change)
+        if cached is None:
+            self.get_uids(directory)
+            return
+
+        uids = dict(cached[1])
+        if name is None:
+            uids.pop(uid, None)
+        else:
+            uids[uid] = name
+
+        self.uids[directory] = (os.stat(directory).st_mtime_ns, uids)
+        self.changed = True
+
+    def forget_uids(self, directory: str):
+        """Forget the UIDs of the homeworks in the directory (e.g. if some of them
+        changed in place)."""
+        if self.uids.pop(directory, None) is not None:
+            self.changed = True
@@ -0,0 +1,112 @@
+"""A module for looking up courses by their (possibly misspelled) names."""
+from collections import Counter
+
+from utilities import *
+
+
+def normalize(text: str) -> str:
+    """Return the text in lowercase and without diacritics."""
+    from unidecode import unidecode
+
+    return unidecode(text.lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the trigrams of the text (padded, so that short words have some too)."""
+    text = f"  {text} "
+    return {text[i: i + 3] for i in range(len(text) - 2)}
+
+
+class Trie:
+    """A prefix tree, storing the values of all keys with the given prefix in the node
+    of the prefix (so that finding them doesn't require walking the subtree)."""
+
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: Dict[str, Trie] = {}
+        self.values: List[Any] = []
+
+    def insert(self, key: str, value: Any):
+        """Insert the value under the given key."""
+        node = self
+        node.values.append(value)
+
+        for char in key:
+            child = node.children.get(char)
+
+            if child is None:
+                child = node.children[char] = Trie()
+
+            node = child
+            node.values.append(value)
+
+    def find(self, prefix: str) -> List[Any]:
+        """Return the values of all keys starting with the prefix."""
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+
+            if node is None:
+                return []
+
+        return node.values
+
+
+class CourseLookup:
+    """An index of the courses by their normalized names and abbreviations, supporting
+    prefix and fuzzy (trigram-based) lookups. The returned courses are in the same
+    order as the courses the index was built from."""
+
+    # the minimum fraction of the trigrams of the query that a fuzzy match must contain
+    FUZZY_THRESHOLD = 0.5
+
+    def __init__(self, courses: List):
+        self.courses = courses
+
+        self.names = Trie()
+        self.trigrams: Dict[str, List[int]] = {}
+
+        # the courses of the same name/abbreviation (i.e. different types of the same
+        # course) share the normalization work
+        normalized: Dict[Tuple[str, str], Tuple[str, Set[str]]] = {}
+
+        for i, course in enumerate(courses):
+            key = (course.name, course.abbreviation)
+
+            if key not in normalized:
+                name = normalize(course.name)
+                normalized[key] = (
+                    name,
+                    trigrams(name) | trigrams(normalize(course.abbreviation)),
+                )
+
+            name, name_trigrams = normalized[key]
+
+            self.names.insert(name, i)
+            for trigram in name_trigrams:
+                self.trigrams.setdefault(trigram, []).append(i)
+
+    def by_name_prefix(self, prefix: str) -> List:
+        """Return the courses whose names start with the prefix."""
+        return [self.courses[i] for i in self.names.find(normalize(prefix))]
+
+    def fuzzy(self, query: str) -> List[Tuple[float, Any]]:
+        """Return the (score, course) pairs of the courses whose names/abbreviations
+        are similar to the query, the most similar ones first."""
+        query_trigrams = trigrams(normalize(query))
+
+        counts = Counter()
+        for trigram in query_trigrams:
+            counts.update(self.trigrams.get(trigram, []))
+
+        scores = [
+            (count / len(query_trigrams), i)
+            for i, count in counts.items()
+            if count / len(query_trigrams) >= self.FUZZY_THRESHOLD
+        ]
+
+        return [
+            (score, self.courses[i])
+            for score, i in sorted(scores, key=lambda x: (-x[0], x[1]))
+        ]
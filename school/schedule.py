@@ -0,0 +1,110 @@
+"""A module for working with the times of the courses during the week."""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from heapq import heappop, heappush
+
+from utilities import *
+
+MINUTES_IN_DAY = 24 * 60
+MINUTES_IN_WEEK = 7 * MINUTES_IN_DAY
+
+
+def get_minute_of_week(now: datetime) -> int:
+    """Return the number of minutes since the start of the week (monday 0:00)."""
+    return now.weekday() * MINUTES_IN_DAY + now.hour * 60 + now.minute
+
+
+def get_semester_week(day: date) -> Optional[int]:
+    """Return the week of the semester (counting from 1) that the day is in, or None if
+    the start of the semester isn't set in the configuration."""
+    if semester_start is None:
+        return None
+
+    monday = semester_start.toordinal() - semester_start.weekday()
+    return (day.toordinal() - monday) // 7 + 1
+
+
+def partition(intervals: List[Tuple[int, int]]) -> List[int]:
+    """Partition the (start, end) intervals into the minimum number of lanes, so that
+    the intervals in each of the lanes don't overlap (touching is fine). Returns the
+    lane of each of the intervals, which is the lowest lane that is free at its start.
+
+    An interval gets a lane other than 0 only if it overlaps another interval, so this
+    can also be used for detecting conflicts."""
+    lanes = [0] * len(intervals)
+
+    # the (end, lane) pairs of the intervals that were placed in a lane, and the lanes
+    # that are free again (their last interval ended)
+    active: List[Tuple[int, int]] = []
+    free: List[int] = []
+
+    for i in sorted(range(len(intervals)), key=lambda i: intervals[i][0]):
+        start, end = intervals[i]
+
+        while len(active) != 0 and active[0][0] <= start:
+            heappush(free, heappop(active)[1])
+
+        lanes[i] = heappop(free) if len(free) != 0 else len(active)
+        heappush(active, (end, lanes[i]))
+
+    return lanes
+
+
+class WeeklySchedule:
+    """An index of the times of the courses during the week (in minutes of the week),
+    sorted by when they start, so the ongoing/next course can be found by bisection."""
+
+    def __init__(self, courses: List):
+        slots = sorted(
+            (
+                slot.weekday() * MINUTES_IN_DAY + slot.start,
+                i,
+                slot.weekday() * MINUTES_IN_DAY + slot.end,
+                slot,
+                course,
+            )
+            for i, course in enumerate(courses)
+            for slot in course.slots()
+        )
+
+        self.starts = [start for start, *_ in slots]
+        self.slots = [(end, slot, course) for _, _, end, slot, course in slots]
+
+        # the length of the longest slot (no slot that started longer ago than that can
+        # be ongoing)
+        self.longest = max((end - start for start, _, end, *_ in slots), default=0)
+
+    def ongoing(self, now: datetime):
+        """Return the ongoing course (the one that started first, if there are more),
+        or None if there is none."""
+        minute, week = get_minute_of_week(now), get_semester_week(now)
+
+        course = None
+        for i in range(
+            bisect_right(self.starts, minute) - 1,
+            bisect_left(self.starts, minute - self.longest) - 1,
+            -1,
+        ):
+            end, slot, slot_course = self.slots[i]
+
+            if minute <= end and slot.is_in_week(week):
+                course = slot_course
+
+        return course
+
+    def next(self, now: datetime):
+        """Return the course that starts the soonest from now (or None if there are no
+        courses)."""
+        minute, week = get_minute_of_week(now), get_semester_week(now)
+
+        # go through the slots from now on, wrapping around to the following weeks
+        # (the slots that are only in odd/even weeks might be two weeks away)
+        first = bisect_left(self.starts, minute)
+        for i in range(first, first + 3 * len(self.slots)):
+            _, slot, course = self.slots[i % len(self.slots)]
+
+            weeks_ahead = i // len(self.slots)
+            if slot.is_in_week(None if week is None else week + weeks_ahead):
+                return course
+
+        return None
@@ -1,18 +1,15 @@
 """A class that contains various useful utility methods."""
 
-import calendar
 import os
 import re
 import sys
 import time
-import urllib.request
-from requests import get, post
 from dataclasses import *
-from pprint import pprint
+from functools import lru_cache
 from typing import *
 
-import typesentry
-from yaml import YAMLError, safe_load
+# NOTE: the heavier modules (yaml, typesentry, ...) are imported only by the functions
+# that need them, so that the script starts up quickly
 
 from config import *
 
@@ -27,21 +24,148 @@ WD_EN = (
 )
 
 
+# the phase -> [seconds, calls] and the name -> count of what was done in the phases
+# (None when the timings are not recorded, i.e. without --timings)
+_phases: Optional[Dict[str, List[float]]] = None
+_counts: Dict[str, int] = {}
+_timings_start = 0.0
+
+
+class _Phase:
+    """A context manager adding its wall time to the time of the phase."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        phase = _phases.setdefault(self.name, [0.0, 0])
+        phase[0] += time.perf_counter() - self.start
+        phase[1] += 1
+
+
+class _NoPhase:
+    """A context manager doing nothing (for when the timings are not recorded)."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *_):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def enable_timings():
+    """Start recording the timings of the phases and the counts (see print_timings)."""
+    global _phases, _timings_start
+
+    _phases, _timings_start = {}, time.perf_counter()
+
+
+def timed(phase: str):
+    """Return a context manager measuring the wall time of the phase (the phases can be
+    nested, the time of the inner ones is included in the outer ones)."""
+    return _NO_PHASE if _phases is None else _Phase(phase)
+
+
+def count(name: str, n: int = 1):
+    """Add n to the count with the given name (files parsed, cache hits, ...)."""
+    if _phases is not None:
+        _counts[name] = _counts.get(name, 0) + n
+
+
+def print_timings():
+    """Print the recorded timings and counts to the standard error."""
+    if _phases is None:
+        return
+
+    total = time.perf_counter() - _timings_start
+    width = max([len(name) for name in list(_phases) + list(_counts)] + [5])
+
+    lines = ["Timings:"]
+    for name, (seconds, calls) in _phases.items():
+        lines.append(
+            f"  {name.ljust(width)} {seconds * 1000:8.1f} ms"
+            f" ({calls} call{'s' if calls != 1 else ''})"
+        )
+    lines.append(f"  {'total'.ljust(width)} {total * 1000:8.1f} ms")
+
+    if len(_counts) != 0:
+        lines.append("Counts:")
+        for name, n in _counts.items():
+            lines.append(f"  {name.ljust(width)} {n:8d}")
+
+    print("\n".join(lines), file=sys.stderr)
+
+
 def check_type(instance, type_hint):
     """Return True if instance corresponds to its type hint."""
+    import typesentry
+
     return typesentry.Config().is_type(instance, type_hint)
 
 
-@dataclass
+def derived(default=None):
+    """A field of a Strict dataclass that is not in its YAML, but instead derived from
+    where the YAML is (it is neither checked nor converted, nor exported)."""
+    return field(default=default, repr=False, compare=False, metadata={"derived": True})
+
+
+def interned(default=MISSING):
+    """A field of a Strict dataclass whose strings are interned, since they repeat a lot
+    (weekday names, teacher names, ...) and the duplicates would waste memory."""
+    return field(default=default, metadata={"intern": True})
+
+
+def intern_strings(value):
+    """Intern the string (or the strings of the list), leaving other values as-is."""
+    if isinstance(value, str):
+        return sys.intern(value)
+
+    if isinstance(value, list):
+        return [sys.intern(v) if isinstance(v, str) else v for v in value]
+
+    return value
+
+
+@lru_cache(maxsize=None)
+def get_fields(cls) -> Tuple[Field, ...]:
+    """Return the fields of the Strict dataclass that are in its YAML (not derived)."""
+    return tuple(f for f in fields(cls) if not f.metadata.get("derived"))
+
+
+@dataclass(slots=True)
 class Strict:
-    """A class for strictly checking whether each of the dataclass variable types match."""
+    """A class for strictly checking whether each of the dataclass variable types match.
+    The checks and the dictionary converters are only generated once per class. The
+    subclasses are slotted too, so their objects don't carry a __dict__ around."""
+
+    # whether to check the types (turned off for the already checked, cached data)
+    validate: ClassVar[bool] = True
+
+    # class -> [(name, type hint, type check)]
+    _validators: ClassVar[Dict[type, List[Tuple[str, Any, Callable]]]] = {}
+
+    # class -> {name: converter of the value of the field}
+    _converters: ClassVar[Dict[type, Dict[str, Optional[Callable]]]] = {}
 
     def __post_init__(self):
         """Perform the check."""
-        for name, field_type in self.__annotations__.items():
-            value = self.__dict__[name]
+        if not Strict.validate:
+            return
 
-            if value is not None and not check_type(value, field_type):
+        for name, field_type, check in self._get_validator():
+            value = getattr(self, name)
+
+            if value is not None and not check(value):
                 raise TypeError(
                     f"The key '{name}' "
                     + f"in {self.__class__.__name__} "
@@ -50,48 +174,246 @@ class Strict:
                 )
 
     @classmethod
-    def from_dictionary(cls, d: Dict):
-        """Initialize the object from the given dictionary."""
-        return cls._from_dictionary(cls, d)
+    def _get_validator(cls) -> List[Tuple[str, Any, Callable]]:
+        """Return the type checks of the fields of the class (generating them once)."""
+        validator = Strict._validators.get(cls)
+
+        if validator is None:
+            import typesentry
+
+            validator = Strict._validators[cls] = [
+                (f.name, f.type, typesentry.checker_for_type(f.type).check)
+                for f in get_fields(cls)
+            ]
+
+        return validator
 
     @classmethod
-    def _from_dictionary(cls, c, d):
-        """A helper function that converts a nested dictionary to a dataclass.
-        Inspired by https://stackoverflow.com/a/54769644."""
+    def _get_converter(cls) -> Dict[str, Optional[Callable]]:
+        """Return the converters of the fields of the class (generating them once).
+        A converter is None when the value of the field is to be kept as-is."""
+        converter = Strict._converters.get(cls)
+
+        if converter is None:
+            converter = Strict._converters[cls] = {
+                f.name: (
+                    intern_strings
+                    if f.metadata.get("intern")
+                    else cls._create_converter(f.type)
+                )
+                for f in get_fields(cls)
+            }
 
-        def _to_dataclass(c, d):
-            fieldtypes = {f.name: f.type for f in fields(c)}
-            return c(**{f: cls._from_dictionary(fieldtypes[f], d[f]) for f in d})
+        return converter
 
+    @classmethod
+    def _create_converter(cls, c) -> Optional[Callable]:
+        """Create a function that converts a nested dictionary to the type c.
+        Inspired by https://stackoverflow.com/a/54769644."""
         # NOTE: if we have a Union, this assumes it's either Type or List[Type]
+        # NOTE: the lists are not converted in place, since the dictionary can be cached
         if len(get_args(c)) != 0:
             c, _ = get_args(c)
 
             if is_dataclass(c):
-                if isinstance(d, List):
-                    for i in range(len(d)):
-                        d[i] = _to_dataclass(c, d[i])
-                else:
-                    d = _to_dataclass(c, d)
+                return lambda d: (
+                    [c._from_dictionary(e) for e in d]
+                    if isinstance(d, List)
+                    else c._from_dictionary(d)
+                )
 
         elif is_dataclass(c):
-            d = _to_dataclass(c, d)
+            return c._from_dictionary
 
-        return d
+        return None
 
     @classmethod
-    def _from_file(cls, path: str):
+    def from_dictionary(cls, d: Dict, validate: bool = True):
+        """Initialize the object from the given dictionary (possibly without checking
+        the types, if the dictionary is trusted)."""
+        if validate:
+            return cls._from_dictionary(d)
+
+        Strict.validate, validate = False, Strict.validate
+        try:
+            return cls._from_dictionary(d)
+        finally:
+            Strict.validate = validate
+
+    @classmethod
+    def _from_dictionary(cls, d: Dict):
+        """A helper function that converts a nested dictionary to the dataclass."""
+        converter = cls._get_converter()
+
+        kwargs = {}
+        for f in d:
+            convert = converter[f]
+            kwargs[f] = d[f] if convert is None else convert(d[f])
+
+        return cls(**kwargs)
+
+    def to_dictionary(self) -> Dict:
+        """Convert the object to a dictionary of JSON-compatible values (the dates are
+        in the ISO format), the reverse of from_dictionary."""
+        return {
+            f.name: to_json_value(getattr(self, f.name)) for f in get_fields(type(self))
+        }
+
+    @classmethod
+    def _from_file(cls, path: str, dictionary: Dict = None, validate: bool = True):
         """Helper function for neatly catching various exceptions that parsing can
-        throw."""
+        throw. If the dictionary of the file is already known (i.e. it was cached), it
+        is used instead of parsing the file again."""
         try:
-            with open(path, "r") as f:
-                return cls.from_dictionary(safe_load(f) or {})
-        except (YAMLError, TypeError) as e:
+            if dictionary is None:
+                dictionary = load_yaml_files([path])[0]
+
+            return cls.from_dictionary(dictionary, validate)
+        except TypeError as e:
             exit_with_error(str(e), path)
         except KeyError as e:
             exit_with_error(f"Invalid key {e}", path)
 
 
+def to_json_value(value):
+    """Convert the value of a dataclass field to a JSON-compatible value."""
+    if isinstance(value, Strict):
+        return value.to_dictionary()
+
+    if isinstance(value, list):
+        return [to_json_value(v) for v in value]
+
+    # dates and datetimes
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+
+    return value
+
+
+def print_records(records: Iterable[Dict], format: str):
+    """Print the records as they are produced, either as a JSON array ('json') or as
+    newline-delimited JSON ('ndjson', one record per line)."""
+    with timed("records"):
+        _print_records(records, format)
+
+
+def _print_records(records: Iterable[Dict], format: str):
+    import json
+
+    if format == "ndjson":
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return
+
+    sys.stdout.write("[")
+    for i, record in enumerate(records):
+        sys.stdout.write(("," if i != 0 else "") + "\n" + json.dumps(record, ensure_ascii=False))
+    sys.stdout.write("\n]\n")
+
+
+def get_yaml_loader():
+    """Return the (much faster) libyaml loader, if PyYAML was built with it, falling
+    back to the pure-Python one if it wasn't."""
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(path: str, loader=None) -> Dict:
+    """Parse the YAML file with the given path (an empty file is an empty dictionary)."""
+    import yaml
+
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=loader or get_yaml_loader()) or {}
+
+
+def _load_yaml_chunk(paths: List[str], loader=None) -> List[Tuple[Optional[Dict], str]]:
+    """Parse the YAML files, returning (dictionary, error) pairs instead of exiting on
+    the broken ones (for parsing in other processes, where exiting makes no sense)."""
+    from yaml import YAMLError
+
+    loader = loader or get_yaml_loader()
+    results = []
+
+    for path in paths:
+        try:
+            results.append((load_yaml(path, loader), ""))
+        except YAMLError as e:
+            results.append((None, str(e)))
+
+    return results
+
+
+def load_yaml_files(paths: Iterable[str], loader=None, processes: int = 1) -> List[Dict]:
+    """Parse a batch of YAML files, exiting with an error on the first broken one. With
+    more than one process (and enough files to be worth starting them), the files are
+    split into chunks that are parsed in a process pool."""
+    paths = list(paths)
+    count("files parsed", len(paths))
+
+    with timed("parse"):
+        results = _load_yaml_files(paths, loader, processes)
+
+    for path, (_, error) in zip(paths, results):
+        if error:
+            exit_with_error(error, path)
+
+    return [dictionary for dictionary, _ in results]
+
+
+def _load_yaml_files(
+    paths: List[str], loader=None, processes: int = 1
+) -> List[Tuple[Optional[Dict], str]]:
+    """Parse the YAML files (see load_yaml_files), returning (dictionary, error) pairs."""
+    import threading
+
+    # forking a process while other threads run can deadlock it, so the process pool is
+    # only started from the main thread (the other threads parse the files themselves)
+    if processes > 1 and len(paths) >= parallel_parsing_threshold \
+            and threading.current_thread() is threading.main_thread():
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        size = -(-len(paths) // (processes * 4))
+        chunks = [paths[i: i + size] for i in range(0, len(paths), size)]
+
+        # forked, since the other start methods would run the school script again
+        with ProcessPoolExecutor(processes, multiprocessing.get_context("fork")) as pool:
+            chunks = pool.map(partial(_load_yaml_chunk, loader=loader), chunks)
+            return [result for chunk in chunks for result in chunk]
+
+    return _load_yaml_chunk(paths, loader)
+
+
+def atomic_write(path: str, contents: str):
+    """Write the contents to the file by writing them to a temporary file first and
+    then renaming it, so the file is never left half-written."""
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}."
+    )
+
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(contents)
+
+        # keep the permissions of the original file (mkstemp creates the file only
+        # readable by the user, so a new one gets the usual ones)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
 def minutes_to_HHMM(minutes: int) -> str:
     """Converts a number of minutes to a string in the form HH:MM."""
     return f"{str(minutes // 60).rjust(2)}:{minutes % 60:02d}"
@@ -107,10 +429,10 @@ def exit_with_error(message: str, path: str = None):
     sys.exit(1)
 
 
-def exit_with_success(message: str):
-    """Exit with an error, possibly giving its path."""
+def print_success(message: str):
+    """Print a success message. Unlike exit_with_error, it doesn't exit, so the
+    successful actions can be followed by others (see the 'batch' action)."""
     print(Ansi.color("SUCCESS: ", 10) + message)
-    sys.exit(0)
 
 
 def due_message_from_timedelta(delta):
@@ -138,6 +460,29 @@ def due_message_from_timedelta(delta):
     return due_msg
 
 
+# the ANSI escape sequences (colors, styles, ...)
+ANSI_ESCAPE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+
+
+@lru_cache(maxsize=1 << 14)
+def display_width(text: str) -> int:
+    """Return the number of terminal columns that the text (without ANSI escapes)
+    takes up: wide characters take up two, combining characters none."""
+    if text.isascii():
+        return len(text)
+
+    import unicodedata
+
+    width = 0
+    for char in text:
+        if unicodedata.category(char) in ("Mn", "Me", "Cf"):
+            continue
+
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+    return width
+
+
 class Ansi:
     """A set of ANSI convenience methods."""
 
@@ -164,7 +509,7 @@ class Ansi:
 
     @classmethod
     def escape(cls, text):
-        return re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])").sub("", text)
+        return ANSI_ESCAPE.sub("", text)
 
     @classmethod
     def __align(cls, text: str, length: int, function: str, *args, **kwargs):
@@ -186,43 +531,94 @@ class Ansi:
 
     @classmethod
     def len(cls, text: str, *args, **kwargs) -> int:
-        return len(cls.escape(text))
+        """The number of terminal columns the text takes up."""
+        return display_width(cls.escape(text))
 
 
 def print_table(table: List[List[str]]):
+    """Print the table, the rows with only one item being headers. The width of each
+    cell is computed only once and the whole table is written at once."""
+    with timed("table"):
+        _print_table(table)
+
+
+def _print_table(table: List[List[str]]):
+    widths = [[Ansi.len(entry) for entry in row] for row in table]
+
     # find max width of each of the columns of the table
     column_widths = [0] * max(len(row) for row in table)
-    for row in table:
+    for row in widths:
         # skip weekday rows
         if len(row) != 1:
-            for i, entry in enumerate(row):
-                if column_widths[i] < Ansi.len(entry):
-                    column_widths[i] = Ansi.len(entry)
+            for i, width in enumerate(row):
+                if column_widths[i] < width:
+                    column_widths[i] = width
 
-    for i, row in enumerate(table):
-        print(end="╭─" if i == 0 else "│ ")
+    column_sep = Ansi.gray(" │ ")
+    max_row_width = sum(column_widths) + Ansi.len(column_sep) * (len(column_widths) - 1)
 
-        column_sep = Ansi.gray(" │ ")
-        max_row_width = sum(column_widths) + Ansi.len(column_sep) * (
-            len(column_widths) - 1
-        )
+    output = []
+    for i, row in enumerate(table):
+        output.append("╭─" if i == 0 else "│ ")
 
         # if only one item is in the row, it will be printed specially
         if len(row) == 1:
-            print(
+            header = Ansi.bold(f"{{ {row[0]} }}")
+            header_width = widths[i][0] + 4
+
+            output.append(
                 (f"{' ' * max_row_width} │\n├─" if i != 0 else "")
-                + Ansi.center(Ansi.bold(f"{{ {row[0]} }}"), max_row_width, "─")
-                + ("─╮" if i == 0 else "─┤")
+                + header.center(max_row_width + len(header) - header_width, "─")
+                + ("─╮\n" if i == 0 else "─┤\n")
             )
         else:
             for j, entry in enumerate(row):
-                print(
-                    Ansi.ljust(entry, column_widths[j])
-                    + (column_sep if j != (len(row) - 1) else " │\n"),
-                    end="",
-                )
-
-    print(f"╰{'─' * (max_row_width + 2)}╯")
+                output.append(entry)
+                output.append(" " * (column_widths[j] - widths[i][j]))
+                output.append(column_sep if j != (len(row) - 1) else " │\n")
+
+    output.append(f"╰{'─' * (max_row_width + 2)}╯\n")
+
+    sys.stdout.write("".join(output))
+
+
+def print_startup_profile(argv: List[str], cwd: str, limit: int = 15):
+    """Run the script with the given arguments again (under -X importtime) and print
+    the modules that took the longest to import."""
+    import subprocess
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=cwd,
+    )
+    total = time.perf_counter() - start
+
+    # the lines are in the form 'import time: self [us] | cumulative | package'
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+        elif not line.endswith("imported package"):
+            self_time, cumulative_time, name = line[len("import time:"):].split("|")
+            modules.append((int(self_time), int(cumulative_time), name.strip()))
+
+    table = [["Startup profile"]]
+    for self_time, cumulative_time, name in sorted(modules, reverse=True)[:limit]:
+        table.append([name, f"{self_time / 1000:.1f} ms", f"{cumulative_time / 1000:.1f} ms"])
+
+    table.append(["Total"])
+    table.append(
+        [
+            f"{len(modules)} modules",
+            f"{sum(m[0] for m in modules) / 1000:.1f} ms",
+            f"{total * 1000:.1f} ms (wall)",
+        ]
+    )
+
+    print_table(table)
 
 
 def pick_one(l: list):